@@ -244,19 +244,6 @@ class ArcGeo():
         Ps, s_ang = abs_geo.get_start_end_points(0)
         Pe, e_ang = abs_geo.get_start_end_points(1)
 
-        O = abs_geo.O
-        r = abs_geo.r
-        IJ = O - Ps
-
-        # If the radius of the element is bigger than the max, radius export the element as an line.
-        if r > PostPro.vars.General["max_arc_radius"]:
-            string = PostPro.lin_pol_xy(Ps, Pe)
-        else:
-            if self.ext > 0:
-                string = PostPro.lin_pol_arc("ccw", Ps, Pe, s_ang, e_ang, r, O, IJ)
-            elif self.ext < 0 and PostPro.vars.General["export_ccw_arcs_only"]:
-                string = PostPro.lin_pol_arc("ccw", Pe, Ps, e_ang, s_ang, r, O, O - Pe)
-            else:
-                string = PostPro.lin_pol_arc("cw", Ps, Pe, s_ang, e_ang, r, O, IJ)
-
-        return string
+        #The Postprocessor decides how the arc is cut
+        return PostPro.arc_pol_xy(self.ext, Ps, Pe, s_ang, e_ang,
+                                  abs_geo.r, abs_geo.O)
@@ -38,7 +38,7 @@ from d2gexceptions import *
 
 logger = logging.getLogger("Core.Config")
 
-CONFIG_VERSION = "9.5"
+CONFIG_VERSION = "9.12"
 """
 version tag - increment this each time you edit CONFIG_SPEC
 
@@ -111,12 +111,39 @@ CONFIG_SPEC = str('''
     mutation_rate = float(default = 0.95)
     max_population = integer(default = 20)
     max_iterations = integer(default = 300)
-    begin_art = option('ordered', 'random', 'heuristic', default = 'heuristic')
+    # start routes: heuristic = nearest neighbour, hilbert = along a space
+    # filling curve (faster for very many shapes)
+    begin_art = option('ordered', 'random', 'heuristic', 'hilbert', default = 'heuristic')
+
+    # Local search (2-opt and Or-opt moves) for the route:
+    #  off: genetic algorithm only
+    #  polish: the best route of the genetic algorithm is improved
+    #  only: no genetic algorithm, the start route is improved
+    local_search = option('off', 'polish', 'only', default = 'polish')
+
+    # above this number of shapes no distance matrix is built, only the nearest
+    # neighbours of each shape are used (no genetic algorithm)
+    sparse_shape_nrs = integer(default = 5000)
+
+    # stop the optimisation of a layer after this many seconds (0 = no limit)
+    max_time = float(default = 0)
+    # stop after this many iterations without a shorter route (0 = never)
+    max_stall_iterations = integer(default = 0)
+
+    # island model: number of worker processes, each with a population of
+    # its own (1 = one population, 0 = one per core)
+    islands = integer(default = 1)
+
+    # size of the cache of optimized routes in kB (0 = no cache), a layer
+    # with the same shapes and settings gets its cached route again
+    route_cache_size = integer(default = 0)
 
     [Import_Parameters]
     point_tolerance = float(default = 0.001)
     spline_check = integer(default = 3)
     fitting_tolerance = float(default = 0.001)
+    # find layers and blocks by the beginning of their names (as in older versions)
+    match_name_prefix = boolean(default = False)
 
     [Layer_Options]
     id_float_separator = string(default = ":")
@@ -211,6 +238,7 @@ class MyConfig():
         self.machine_type = self.vars.General['machine_type']
         self.fitting_tolerance = self.vars.Import_Parameters['fitting_tolerance']
         self.point_tolerance = self.vars.Import_Parameters['point_tolerance']
+        self.match_name_prefix = self.vars.Import_Parameters['match_name_prefix']
 
         self.metric = 1  # true unit is determined while importing
         self.tool_units_metric = 0 if self.vars.General['tool_units'] == 'in' else 1
@@ -46,6 +46,13 @@ class Point(object):
     def __str__(self):
         return 'X -> %6.3f  Y -> %6.3f' % (self.x, self.y)
 
+    def __reduce__(self):
+        """
+        Points are pickled (e.g. for the worker processes) as their
+        coordinates, much faster than the default for __slots__
+        """
+        return (Point, (self.x, self.y, self.z))
+
     def __eq__(self, other):
         return (-1e-12 < self.x - other.x < 1e-12) and (-1e-12 < self.y - other.y < 1e-12)
 
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+############################################################################
+#
+#   Copyright (C) 2015
+#
+#   This file is part of DXF2GCODE.
+#
+#   DXF2GCODE is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   DXF2GCODE is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with DXF2GCODE.  If not, see <http://www.gnu.org/licenses/>.
+#
+############################################################################
+
+"""
+Run independent jobs in worker processes.
+
+The workers are forked, so they see the loaded configuration (g.config)
+of the main process. Where processes can't be forked the jobs are done
+in the main process.
+"""
+
+from __future__ import absolute_import
+import os
+import logging
+import multiprocessing
+
+logger = logging.getLogger("Core.ProcessPool")
+
+
+def get_worker_count(jobs=1):
+    """
+    Number of worker processes for the jobs option (0 = all cores)
+    @param jobs: the requested number of workers
+    @return: the number of workers, at least 1
+    """
+    if jobs is None:
+        return 1
+    if jobs <= 0:
+        try:
+            return multiprocessing.cpu_count()
+        except NotImplementedError:
+            return 1
+    return jobs
+
+
+def map_jobs(function, job_args, jobs=1, chunksize=1):
+    """
+    Call the function for each of the job arguments and return the results
+    in the order of the arguments. With more than one worker the calls are
+    done in worker processes, so function, arguments and results must be
+    picklable (function has to be defined at module level).
+    @param function: the function to call with one argument
+    @param job_args: list of the arguments
+    @param jobs: number of worker processes (0 = all cores)
+    @param chunksize: number of jobs sent to a worker at once (None = chosen
+    by the pool, good for many small jobs)
+    @return: list of the results
+    """
+    workers = min(get_worker_count(jobs), len(job_args))
+
+    if workers > 1 and not(hasattr(os, 'fork')):
+        logger.debug("No worker processes without fork, running %i jobs serially" % len(job_args))
+        workers = 1
+
+    if workers <= 1:
+        return [function(args) for args in job_args]
+
+    logger.debug("Running %i jobs in %i worker processes" % (len(job_args), workers))
+    pool = multiprocessing.Pool(workers)
+    try:
+        results = pool.map(function, job_args, chunksize)
+    finally:
+        pool.close()
+        pool.join()
+    return results
@@ -271,17 +271,14 @@ class ShapeClass():
 
     def Write_GCode(self, LayerContent=None, PostPro=None):
         """
-        This method returns the string to be exported for this shape, including
-        the defined start and end move of the shape.
+        This method writes the code of this shape to the writer of the
+        PostPro, including the defined start and end move of the shape.
         @param LayerContent: This parameter includes the parent LayerContent
         which includes tool and additional cutting parameters.
         @param PostPro: this is the Postprocessor class including the methods
         to export
         """
-
-
-        # initialisation of the string
-        exstr = ""
+        write = PostPro.writer.write
 
         # Create the Start_moves once again if something was changed.
         #self.stmove.make_start_moves()
@@ -289,19 +286,17 @@ class ShapeClass():
 
         # Move the tool to the start.
         start, start_ang = self.get_st_en_points(0)
-        exstr += PostPro.rap_pos_xy(start)
-        #exstr += self.stmove.geos[0].Write_GCode(parent=self.parent, PostPro=PostPro)
+        write(PostPro.rap_pos_xy(start))
+        #write(self.stmove.geos[0].Write_GCode(parent=self.parent, PostPro=PostPro))
 
         # Add string to be added before the shape will be cut.
-        exstr += PostPro.write_pre_shape_cut()
+        write(PostPro.write_pre_shape_cut())
 
         # Write the geometries for the first cut
         for geo in self.geos:
-            exstr += geo.Write_GCode(self.parent, PostPro)
+            write(geo.Write_GCode(self.parent, PostPro))
 
         # Add string to be added before the shape will be cut.
-        exstr += PostPro.write_post_shape_cut()
-
-        return exstr
+        write(PostPro.write_post_shape_cut())
 
 
@@ -51,6 +51,7 @@ PY_EXTENSION = '.py'
 BAD_CONFIG_EXTENSION = '.bad'
 DEFAULT_CONFIG_DIR = 'config'
 DEFAULT_POSTPRO_DIR = 'postpro_config'
+DEFAULT_ROUTE_CACHE_DIR = 'route_cache'
 
 # log related
 DEFAULT_LOGFILE = 'dxf2gcode.log'
@@ -90,12 +90,16 @@ class ContourClass:
         """
         remove_other_closed_contour()
         """
+        #Count the points, the contour ends before the first point which
+        #appears more than once
+        counts = {}
         for i in range(len(self.order)):
-            for j in range(i + 1, len(self.order)):
-                #print '\ni: '+str(i)+'j: '+str(j)
-                if self.order[i][0] == self.order[j][0]:
-                    self.order = self.order[0:i]
-                    break
+            counts[self.order[i][0]] = counts.get(self.order[i][0], 0) + 1
+
+        for i in range(len(self.order)):
+            if counts[self.order[i][0]] > 1:
+                self.order = self.order[0:i]
+                break
         return 
     
     
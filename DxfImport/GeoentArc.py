@@ -82,30 +82,30 @@ class GeoentArc():
 
         #X Value
         s = lp.index_code(10, s + 1)
-        x0 = float(lp.line_pair[s].value)
+        x0 = lp.get_float(s)
 
         #Y Value
         s = lp.index_code(20, s + 1)
-        y0 = float(lp.line_pair[s].value)
+        y0 = lp.get_float(s)
         O = Point(x0, y0)
 
         #Radius
         s = lp.index_code(40, s + 1)
-        r = float(lp.line_pair[s].value)
+        r = lp.get_float(s)
 
         #Start angle
         s = lp.index_code(50, s + 1)
-        s_ang = radians(float(lp.line_pair[s].value))
+        s_ang = radians(lp.get_float(s))
 
         #End angle
         s = lp.index_code(51, s + 1)
-        e_ang = radians(float(lp.line_pair[s].value))
+        e_ang = radians(lp.get_float(s))
 
         #Searching for an extrusion direction
         s_nxt_xt = lp.index_code(230, s + 1, e)
         #If there is a extrusion direction given flip around x-Axis
         if s_nxt_xt != None:
-            extrusion_dir = float(lp.line_pair[s_nxt_xt].value)
+            extrusion_dir = lp.get_float(s_nxt_xt)
             logger.debug(('Found extrusion direction: %s')
                                  % extrusion_dir)
             if extrusion_dir == -1:
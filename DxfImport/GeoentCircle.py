@@ -81,21 +81,21 @@ class GeoentCircle():
 
         #X Value
         s = lp.index_code(10, s + 1)
-        x0 = float(lp.line_pair[s].value)
+        x0 = lp.get_float(s)
 
         #Y Value
         s = lp.index_code(20, s + 1)
-        y0 = float(lp.line_pair[s].value)
+        y0 = lp.get_float(s)
 
         #Radius
         s = lp.index_code(40, s + 1)
-        r = float(lp.line_pair[s].value)
+        r = lp.get_float(s)
 
         #Searching for an extrusion direction
         s_nxt_xt = lp.index_code(230, s + 1, e)
         #If there is a extrusion direction given flip around x-Axis
         if s_nxt_xt != None:
-            extrusion_dir = float(lp.line_pair[s_nxt_xt].value)
+            extrusion_dir = lp.get_float(s_nxt_xt)
             logger.debug(self.tr('Found extrusion direction: %s')
                                  % extrusion_dir)
             if extrusion_dir == -1:
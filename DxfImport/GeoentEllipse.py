@@ -61,12 +61,31 @@ class GeoentEllipse:
         #Lesen der Geometrie / Read the geometry
         self.Read(caller)
 
+        #Errechnen der Ellipse / Calculate the ellipse
+        self.Ellipse_Grundwerte()
+
+        #Fit now or collect it for fitting in the worker processes
+        if caller.fit_geos is None:
+            self.set_geo(self.calc_geo())
+        else:
+            caller.fit_geos.append(self)
+
+    def calc_geo(self):
+        """
+        calc_geo() - Fit the ellipse with biarcs
+        @return: the list of the fitted geometries
+        """
         #Zuweisen der Toleranz f�rs Fitting / Assign the tolerance for fitting
         tol = g.config.fitting_tolerance
 
-        #Errechnen der Ellipse / Calculate the ellipse
-        self.Ellipse_Grundwerte()
         self.Ellipse_2_Arcs(tol)
+        return self.geo
+
+    def set_geo(self, geo):
+        """
+        set_geo() - Assign the fitted geometries
+        """
+        self.geo = geo
 
 
     def __str__(self):
@@ -124,28 +143,28 @@ class GeoentEllipse:
 
         #Centre X value, Y value
         s = lp.index_code(10, s + 1)
-        x0 = float(lp.line_pair[s].value)
+        x0 = lp.get_float(s)
         s = lp.index_code(20, s + 1)
-        y0 = float(lp.line_pair[s].value)
+        y0 = lp.get_float(s)
         self.center = Point(x0, y0)
         #XWert, YWert. Vektor, relativ zum Zentrum, Gro�e Halbachse
         #X value, Y value. Vector relative to the center, Semi-major axis
         s = lp.index_code(11, s + 1)
-        x1 = float(lp.line_pair[s].value)
+        x1 = lp.get_float(s)
         s = lp.index_code(21, s + 1)
-        y1 = float(lp.line_pair[s].value)
+        y1 = lp.get_float(s)
         self.vector = Point(x1, y1)
         #Ratio minor to major axis
         s = lp.index_code(40, s + 1)
-        self.ratio = float(lp.line_pair[s].value)
+        self.ratio = lp.get_float(s)
         #Start Winkel - Achtung, ist als rad (0-2pi) im dxf
         #Start angle - Note in radian (0-2pi) per dxf
         s = lp.index_code(41, s + 1)
-        self.AngS = float(lp.line_pair[s].value)
+        self.AngS = lp.get_float(s)
         #End Winkel - Achtung, ist als rad (0-2pi) im dxf
         #End angle - Note in radian (0-2pi) per dxf
         s = lp.index_code(42, s + 1)
-        self.AngE = float(lp.line_pair[s].value)
+        self.AngE = lp.get_float(s)
         #Neuen Startwert f�r die n�chste Geometrie zur�ckgeben
         #New starting value for the next geometry return
         caller.start = e
@@ -83,32 +83,32 @@ class GeoentInsert:
         
         #X Value
         s = lp.index_code(10, s + 1, e)
-        x0 = float(lp.line_pair[s].value)
+        x0 = lp.get_float(s)
         
         #Y Value
         s = lp.index_code(20, s + 1, e)
-        y0 = float(lp.line_pair[s].value)
+        y0 = lp.get_float(s)
         self.Point = Point(x0, y0)
         
         #XScale
         s_temp = lp.index_code(41, s + 1, e)
         if s_temp != None:
-            self.Scale[0] = float(lp.line_pair[s_temp].value)
+            self.Scale[0] = lp.get_float(s_temp)
         
         #YScale
         s_temp = lp.index_code(42, s + 1, e)
         if s_temp != None:
-            self.Scale[1] = float(lp.line_pair[s_temp].value)
+            self.Scale[1] = lp.get_float(s_temp)
         
         #ZScale
         s_temp = lp.index_code(43, s + 1, e)
         if s_temp != None:
-            self.Scale[2] = float(lp.line_pair[s_temp].value)
+            self.Scale[2] = lp.get_float(s_temp)
         
         #Rotation
         s_temp = lp.index_code(50, s + 1, e)
         if s_temp != None:
-            self.rot = radians(float(lp.line_pair[s_temp].value))
+            self.rot = radians(lp.get_float(s_temp))
         
         #New starting value for the next geometry
         caller.start = e      
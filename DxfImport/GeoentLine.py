@@ -95,25 +95,25 @@ class GeoentLine:
 
         #X Value
         sl = lp.index_code(10, s + 1)
-        x0 = float(lp.line_pair[sl].value)
+        x0 = lp.get_float(sl)
 
         #Y Value
         s = lp.index_code(20, sl + 1)
-        y0 = float(lp.line_pair[s].value)
+        y0 = lp.get_float(s)
 
         #X Value 2
         s = lp.index_code(11, sl + 1)
-        x1 = float(lp.line_pair[s].value)
+        x1 = lp.get_float(s)
 
         #Y Value 2
         s = lp.index_code(21, s + 1)
-        y1 = float(lp.line_pair[s].value)
+        y1 = lp.get_float(s)
 
         #Searching for an extrusion direction
         s_nxt_xt = lp.index_code(230, s + 1, e)
         #If there is a extrusion direction given flip around x-Axis
         if s_nxt_xt != None:
-            extrusion_dir = float(lp.line_pair[s_nxt_xt].value)
+            extrusion_dir = lp.get_float(s_nxt_xt)
             logger.debug(self.tr('Found extrusion direction: %s') %extrusion_dir)
             if extrusion_dir == -1:
                 x0 = -x0
@@ -141,11 +141,11 @@ class GeoentLwPolyline:
             #X Value
             if s == None:
                 break
-            x = float(lp.line_pair[s].value)
+            x = lp.get_float(s)
 
             #Y Value
             s = lp.index_code(20, s + 1, e)
-            y = float(lp.line_pair[s].value)
+            y = lp.get_float(s)
             Pe = Point(x=x, y=y)
 
             #Bulge
@@ -163,7 +163,7 @@ class GeoentLwPolyline:
 
             #print('stemp: %s, e: %s, next 10: %s' %(s_temp,e,lp.index_code(10,s+1,e)))
             if s_bulge != None:
-                bulge = float(lp.line_pair[s_bulge].value)
+                bulge = lp.get_float(s_bulge)
                 s_nxt_x = s_nxt_x
 
             #Take the next X value as the starting value
@@ -85,11 +85,11 @@ class GeoentPoint:
 
         #X Value
         s = lp.index_code(10, s + 1)
-        x0 = float(lp.line_pair[s].value)
+        x0 = lp.get_float(s)
 
         #Y Value
         s = lp.index_code(20, s + 1)
-        y0 = float(lp.line_pair[s].value)
+        y0 = lp.get_float(s)
 
         Ps = Point(x0, y0)
 
@@ -152,11 +152,11 @@ class GeoentPolyline:
 
             #X Value
             s = lp.index_code(10, s + 1, e)
-            x = float(lp.line_pair[s].value)
+            x = lp.get_float(s)
 
             #Y Value
             s = lp.index_code(20, s + 1, e)
-            y = float(lp.line_pair[s].value)
+            y = lp.get_float(s)
             Pe = Point(x=x, y=y)
 
             #Bulge
@@ -169,7 +169,7 @@ class GeoentPolyline:
             s_temp = lp.index_code(42, s + 1, e_vertex)
             #print('stemp: %s, e: %s, next 10: %s' %(s_temp,e,lp.index_both(0,"VERTEX",s+1,e)))
             if s_temp != None:
-                bulge = float(lp.line_pair[s_temp].value)
+                bulge = lp.get_float(s_temp)
                 s = s_temp
 
             #Vertex flag (bit-coded); default is 0; 1 = Closed; 128 = Plinegen
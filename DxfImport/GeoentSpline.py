@@ -52,6 +52,17 @@ class GeoentSpline:
         #Read the geometry
         self.Read(caller)
 
+        #Fit now or collect it for fitting in the worker processes
+        if caller.fit_geos is None:
+            self.set_geo(self.calc_geo())
+        else:
+            caller.fit_geos.append(self)
+
+    def calc_geo(self):
+        """
+        calc_geo() - Fit the spline with arcs
+        @return: the list of the fitted geometries
+        """
         #Zuweisen der Toleranz f�rs Fitting
         #Assign the fitting tolerance
         tol = g.config.fitting_tolerance
@@ -62,9 +73,15 @@ class GeoentSpline:
         Spline2ArcsClass = Spline2Arcs(degree=self.degree, Knots=self.Knots, \
                                 Weights=self.Weights, CPoints=self.CPoints, tol=tol, check=check)
 
+        return Spline2ArcsClass.Curve
 
-        self.geo = Spline2ArcsClass.Curve
+    def set_geo(self, geo):
+        """
+        set_geo() - Assign the fitted geometries
+        """
+        self.geo = geo
 
+        self.length = 0.0
         for geo in self.geo:
             self.length += geo.length
 
@@ -177,7 +194,7 @@ class GeoentSpline:
             sk = lp.index_code(40, s + 1, e)
             if sk == None:
                 break
-            self.Knots.append(float(lp.line_pair[sk].value))
+            self.Knots.append(lp.get_float(sk))
             s = sk
 
         #Read the weights
@@ -187,7 +204,7 @@ class GeoentSpline:
             sg = lp.index_code(41, s + 1, e)
             if sg == None:
                 break
-            self.Weights.append(float(lp.line_pair[sg].value))
+            self.Weights.append(lp.get_float(sg))
             s = sg
 
         #Read the control points
@@ -199,11 +216,11 @@ class GeoentSpline:
             #Cancel if no new item was detected
             if s == None:
                 break
-            x = float(lp.line_pair[s].value)
+            x = lp.get_float(s)
 
             #Y value
             s = lp.index_code(20, s + 1, e)
-            y = float(lp.line_pair[s].value)
+            y = lp.get_float(s)
 
             self.CPoints.append(Point(x, y))
 
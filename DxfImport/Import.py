@@ -26,7 +26,8 @@
 import Core.Globals as g
 
 from Core.Point import Point
-from DxfImport.Classes import ContourClass
+from Core.ProcessPool import get_worker_count, map_jobs
+from DxfImport.Classes import PointsClass, ContourClass
 
 from DxfImport.GeoentArc import GeoentArc
 from DxfImport.GeoentCircle import GeoentCircle
@@ -39,8 +40,12 @@ from DxfImport.GeoentLwpolyline import GeoentLwPolyline
 from DxfImport.GeoentPoint import GeoentPoint
 
 
-from copy import deepcopy, copy
 from string import find, strip
+from bisect import bisect_left
+from array import array
+from math import floor
+from collections import OrderedDict
+import mmap
 
 import logging
 logger = logging.getLogger("DxfImport.Import")
@@ -48,18 +53,30 @@ logger = logging.getLogger("DxfImport.Import")
 
 class ReadDXF():
     #Initialise the class
-    def __init__(self, filename=None):
+    def __init__(self, filename=None, jobs=1):
+        """
+        @param filename: the DXF file to read. Without a file only the contour
+        search can be used (e.g. in the worker processes)
+        @param jobs: number of worker processes for the contour search of the
+        blocks and entities (1 = no workers, 0 = all cores)
+        """
 
         #Setting up logger
         #logger = g.logger.logger
 
-        str_ = self.Read_File(filename)
-        g.config.metric = self.Get_Unit(str_)
-
-        self.update_tool_values()
+        self.jobs = jobs
+        #Splines and ellipses to fit in the worker processes
+        self.fit_geos = None
+        if filename is None:
+            return
 
         #Load the contour and store the values in the classes
-        self.line_pairs = self.Get_Line_Pairs(str_)
+        self.line_pairs = self.Map_Line_Pairs(filename)
+        if self.line_pairs is None:
+            self.line_pairs = self.Read_Line_Pairs(filename)
+        g.config.metric = self.Get_Unit()
+
+        self.update_tool_values()
 
         #Debug Informationen
         #logger.info(("\n\nFile has   %0.0f Lines" % len(str_)), 1)
@@ -69,49 +86,59 @@ class ReadDXF():
         sections_pos = self.Get_Sections_pos()
         self.layers = self.Read_Layers(sections_pos)
 
+        #Layer and block numbers by name (searched names in the prefix mode)
+        self.layer_nrs = {}
+        self.block_nrs = {}
+        if not(g.config.match_name_prefix):
+            for layer_nr in range(len(self.layers)):
+                self.layer_nrs.setdefault(self.layers[layer_nr].name, layer_nr)
+
+        if get_worker_count(self.jobs) > 1:
+            self.fit_geos = []
+
         blocks_pos = self.Get_Blocks_pos(sections_pos)
         self.blocks = self.Read_Blocks(blocks_pos)
+        if not(g.config.match_name_prefix):
+            for block_nr in range(len(self.blocks.Entities)):
+                self.block_nrs.setdefault(self.blocks.Entities[block_nr].Name, block_nr)
         self.entities = self.Read_Entities(sections_pos)
 
+        #All geometries are read, the line pairs are no longer needed
+        self.line_pairs.close()
+
+        if self.fit_geos is not None:
+            self.Fit_Geos()
+
         #Call the class to define the contours of search
         #Loop for the number of blocks and the layer
-        for i in range(len(self.blocks.Entities)):
-            # '\n'
-            #print self.blocks.Entities[i]
-            logger.info(("Creating Contours of Block Nr: %i") %i)
-            self.blocks.Entities[i].cont = self.Get_Contour(self.blocks.Entities[i])
-
-        logger.info(("Creating Contours of Entities"))
-        self.entities.cont = self.Get_Contour(self.entities)
+        if get_worker_count(self.jobs) > 1:
+            self.Get_Contours_Parallel()
+        else:
+            for i in range(len(self.blocks.Entities)):
+                # '\n'
+                #print self.blocks.Entities[i]
+                logger.info(("Creating Contours of Block Nr: %i") %i)
+                self.blocks.Entities[i].cont = self.Get_Contour(self.blocks.Entities[i])
 
+            logger.info(("Creating Contours of Entities"))
+            self.entities.cont = self.Get_Contour(self.entities)
 
 
 
-    def Read_File(self, filename):
-        """
-        Read_File() - Load the selected DXF files
-        @param: filename: name of the file to load
-        @return: file contents as a list of strings
-        """
-        file_ = open(filename, 'r')
-        str_ = file_.readlines()
-        file_.close()
-        return str_
 
-    def Get_Unit(self, str):
+    def Get_Unit(self):
         """
         Get_Unit() - Get unit of measure English (Imperial) or Metric from DXF file
         """
         #Sets drawing units: 0 = English; 1 = Metric
         # Metric will be treated as being in millimeters
         # English as inches
+        lp = self.line_pairs
 
         metric = 1 # default: metric
         try:
-            line = 0
-            while (find(str[line], "$MEASUREMENT") < 0):
-                line += 1
-            metric = int(strip(str[line + 2]))
+            s = lp.index_both(9, "$MEASUREMENT")
+            metric = int(lp.line_pair[s + 1].value)
         except: # $MEASUREMENT not found or is incorrect
             pass
 
@@ -123,13 +150,10 @@ class ReadDXF():
         # 16 = Hectometers; 17 = Gigameters; 18 = Astronomical units;
         # 19 = Light years; 20 = Parsecs
         try:
-            line = 0
-            while (find(str[line], "$INSUNITS") < 0):
-                line += 1
-            line += 2
-            if int(strip(str[line])) == 1:
+            s = lp.index_both(9, "$INSUNITS")
+            if int(lp.line_pair[s + 1].value) == 1:
                 metric = 0
-            elif int(strip(str[line])) == 4:
+            elif int(lp.line_pair[s + 1].value) == 4:
                 metric = 1
         except: # $INSUNITS not found or is incorrect
             pass
@@ -151,28 +175,118 @@ class ReadDXF():
                 g.config.vars.Tool_Parameters[tool]['start_radius'] *= scale
             g.config.tool_units_metric = g.config.metric
 
-    #Convert the uploaded file to line pairs (code & Value).
-    def Get_Line_Pairs(self, string):
-        line = 0
-        line_pairs = dxflinepairsClass([])
+    #Map the file and store only the positions of the line pairs (code & Value).
+    def Map_Line_Pairs(self, filename):
+        """
+        Map_Line_Pairs() - Map the DXF file into memory and store the codes and
+        the byte positions of the values. The values are decoded on access.
+        @param: filename: name of the file to load
+        @return: the line pairs of the file (dxfmmaplinepairsClass) or None
+        if the file can't be mapped (e.g. empty file)
+        """
+        file_ = open(filename, 'rb')
+        try:
+            mm = mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, EnvironmentError):
+            file_.close()
+            return None
+        file_.close()
 
-        #Start at the first SECTION
-        while (find(string[line], "SECTION") < 0):
-            line += 1
-        line -= 1
+        codes = array('h')
+        starts = array('l')
+        ends = array('l')
+        size = len(mm)
+        whitespace = " \t\r\n\x0b\x0c"
+
+        #Start at the line before the first SECTION
+        pos = mm.find("SECTION")
+        if pos > 0:
+            pos = mm.rfind("\n", 0, pos) + 1
+        if pos > 0:
+            pos = mm.rfind("\n", 0, pos - 1) + 1
+        else:
+            pos = size
 
         #Continue to the end if no error occurs. Otherwise abort with error
         try:
-            while line < len(string):
-                line_pairs.line_pair.append(dxflinepairClass(int(strip(string[line])), strip(string[line + 1])))
-                line += 2
+            while pos < size:
+                end = mm.find("\n", pos)
+                if end < 0:
+                    end = size
+                code = int(mm[pos:end])
+
+                start = end + 1
+                if start >= size:
+                    raise ValueError("Missing value for code %i" % code)
+                pos = mm.find("\n", start)
+                if pos < 0:
+                    pos = size
+                end = pos
+                pos += 1
+
+                while start < end and mm[start] in whitespace:
+                    start += 1
+                while end > start and mm[end - 1] in whitespace:
+                    end -= 1
+
+                codes.append(code)
+                starts.append(start)
+                ends.append(end)
+
+        except (ValueError, OverflowError):
+            line = 0
+            end = mm.find("\n")
+            while 0 <= end < pos:
+                line += 1
+                end = mm.find("\n", end + 1)
+            logger.warning(("Failure reading lines stopped at line %0.0f. "
+                            "Please check/correct line in dxf file") % (line))
 
-        except:
+        line_pairs = dxfmmaplinepairsClass(mm, codes, starts, ends)
+        logger.debug(('Did read %i of linepairs from DXF ') % line_pairs.nrs)
+        return line_pairs
 
-            #showwarning("Warning reading linepairs", ("Failure reading line stopped at line %0.0f.\n Please check/correct line in dxf file" % (line)))
-            g.logger.logger.info(("\n!Warning! Failure reading lines stopped at line %0.0f.\n Please check/correct line in dxf file\n " % (line)))
+    #Convert the file to line pairs (code & Value) while reading it.
+    def Read_Line_Pairs(self, filename):
+        """
+        Read_Line_Pairs() - Read the DXF file line by line into line pairs.
+        The codes are kept in an array and the values as interned strings, so
+        the file is never held in memory as a whole.
+        @param: filename: name of the file to load
+        @return: the line pairs of the file (dxflinepairsClass)
+        """
+        codes = array('h')
+        values = []
+        line = 0
 
-        line_pairs.nrs = len(line_pairs.line_pair)
+        file_ = open(filename, 'r')
+        try:
+            #Start at the first SECTION
+            code_line = None
+            for value_line in file_:
+                line += 1
+                if find(value_line, "SECTION") >= 0:
+                    break
+                code_line = value_line
+
+            #Continue to the end if no error occurs. Otherwise abort with error
+            try:
+                while code_line is not None:
+                    codes.append(int(strip(code_line)))
+                    values.append(intern(strip(value_line)))
+
+                    code_line = next(file_, None)
+                    if code_line is not None:
+                        value_line = next(file_)
+                        line += 2
+
+            except (ValueError, OverflowError, StopIteration):
+                logger.warning(("Failure reading lines stopped at line %0.0f. "
+                                "Please check/correct line in dxf file") % (line))
+        finally:
+            file_.close()
+
+        line_pairs = dxflinepairsClass(codes, values)
         logger.debug(('Did read %i of linepairs from DXF ') % line_pairs.nrs)
         return line_pairs
 
@@ -291,7 +405,7 @@ class ReadDXF():
                 blocks.Entities[-1].basep.x = 0.0
                 s = blocks_pos[block_nr].begin + 1
             else:
-                blocks.Entities[-1].basep.x = float(lp.line_pair[s].value)
+                blocks.Entities[-1].basep.x = lp.get_float(s)
 
             #Y value
             s = lp.index_code(20, s + 1, e)
@@ -299,7 +413,7 @@ class ReadDXF():
                 blocks.Entities[-1].basep.y = 0.0
                 s = blocks_pos[block_nr].begin + 1
             else:
-                blocks.Entities[-1].basep.y = float(lp.line_pair[s].value)
+                blocks.Entities[-1].basep.y = lp.get_float(s)
 
             #Read the geometries
             blocks.Entities[-1].geo = self.Get_Geo(s, e)
@@ -329,8 +443,7 @@ class ReadDXF():
 
         while self.start != None:
             #Load the currently found geometry
-            name = self.line_pairs.line_pair[self.start].value
-            entitie_geo = self.get_geo_entitie(len(geos), name)
+            entitie_geo = self.get_geo_entitie(len(geos))
 
             #Append only if something was found
             if entitie_geo != None:
@@ -361,9 +474,11 @@ class ReadDXF():
     #Distributor for Geo instances ???
     # is called in def Get_Geo
     # For a release of the entire code can be happy again end up in a file. ???
-    def get_geo_entitie(self, geo_nr, name):
+    def get_geo_entitie(self, geo_nr):
         """
-        get_geo_entitie()
+        get_geo_entitie() - The name of the entity at self.start is compared
+        within the line pairs, it is only decoded for the log message of an
+        unsupported entity
         """
         #Entities:
         # 3DFACE, 3DSOLID, ACAD_PROXY_ENTITY, ARC, ATTDEF, ATTRIB, BODY
@@ -374,26 +489,29 @@ class ReadDXF():
 
         # Instanz des neuen Objekts anlegen und gleichzeitig laden
         # Create a new instance of the object and at the same load ???
-        if(name == "POLYLINE"):
+        lp = self.line_pairs
+        if lp.value_equals(self.start, "POLYLINE"):
             geo = GeoentPolyline(geo_nr, self)
-        elif (name == "SPLINE"):
+        elif lp.value_equals(self.start, "SPLINE"):
             geo = GeoentSpline(geo_nr, self)
-        elif (name == "ARC"):
+        elif lp.value_equals(self.start, "ARC"):
             geo = GeoentArc(geo_nr, self)
-        elif (name == "CIRCLE"):
+        elif lp.value_equals(self.start, "CIRCLE"):
             geo = GeoentCircle(geo_nr, self)
-        elif (name == "LINE"):
+        elif lp.value_equals(self.start, "LINE"):
             geo = GeoentLine(geo_nr, self)
-        elif (name == "INSERT"):
+        elif lp.value_equals(self.start, "INSERT"):
             geo = GeoentInsert(geo_nr, self)
-        elif (name == "ELLIPSE"):
+        elif lp.value_equals(self.start, "ELLIPSE"):
             geo = GeoentEllipse(geo_nr, self)
-        elif (name == "LWPOLYLINE"):
+        elif lp.value_equals(self.start, "LWPOLYLINE"):
             geo = GeoentLwPolyline(geo_nr, self)
-        elif (name == "POINT"):
+        elif lp.value_equals(self.start, "POINT"):
             geo = GeoentPoint(geo_nr, self)
         else:
-            logger.info(("Found unsupported geometry type: %s !" % name))
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(("Found unsupported geometry type: %s !"
+                             % lp.get_value(self.start)))
             self.start += 1 #Eins hochz�hlen sonst gibts ne dauer Schleife
             return None
 
@@ -402,27 +520,74 @@ class ReadDXF():
     def Get_Layer_Nr(self, Layer_Name):
         """
         Get_Layer_Nr() - Find the number of geometry layers
+        With match_name_prefix the first layer starting with the name is used
         """
-        for i in range(len(self.layers)):
-            if (find(self.layers[i].name, Layer_Name) == 0):
-                layer_nr = i
-                return layer_nr
-        layer_nr = len(self.layers)
-        self.layers.append(LayerClass(layer_nr))
-        self.layers[-1].name = Layer_Name
+        if Layer_Name in self.layer_nrs:
+            return self.layer_nrs[Layer_Name]
+
+        layer_nr = None
+        if g.config.match_name_prefix:
+            for i in range(len(self.layers)):
+                if (find(self.layers[i].name, Layer_Name) == 0):
+                    layer_nr = i
+                    break
+
+        if layer_nr == None:
+            layer_nr = len(self.layers)
+            self.layers.append(LayerClass(layer_nr))
+            self.layers[-1].name = Layer_Name
+
+        self.layer_nrs[Layer_Name] = layer_nr
         return layer_nr
 
     def Get_Block_Nr(self, Block_Name):
         """
         Get_Block_Nr() - Find the number of blocks
+        With match_name_prefix the first block starting with the name is used
         """
+        if Block_Name in self.block_nrs:
+            return self.block_nrs[Block_Name]
+
         block_nr = -1
-        for i in range(len(self.blocks.Entities)):
-            if (find(self.blocks.Entities[i].Name, Block_Name) == 0):
-                block_nr = i
-                break
+        if g.config.match_name_prefix:
+            for i in range(len(self.blocks.Entities)):
+                if (find(self.blocks.Entities[i].Name, Block_Name) == 0):
+                    block_nr = i
+                    break
+            self.block_nrs[Block_Name] = block_nr
+
         return block_nr
 
+    def Fit_Geos(self):
+        """
+        Fit_Geos() - Fit the collected splines and ellipses in worker
+        processes and assign the geometries in the order of the entities
+        """
+        logger.info(("Fitting %i Splines and Ellipses with %i jobs")
+                    % (len(self.fit_geos), get_worker_count(self.jobs)))
+
+        results = map_jobs(Fit_Geo_Job, self.fit_geos, self.jobs, None)
+
+        for entitie_geo, geo in zip(self.fit_geos, results):
+            entitie_geo.set_geo(geo)
+        self.fit_geos = None
+
+    def Get_Contours_Parallel(self):
+        """
+        Get_Contours_Parallel() - Search the contours of all blocks and the
+        entities in worker processes. The search may change the geometries
+        (e.g. the direction), so these are taken over from the workers too.
+        """
+        all_entities = self.blocks.Entities + [self.entities]
+        logger.info(("Creating Contours of %i Blocks and Entities with %i jobs")
+                    % (len(self.blocks.Entities), get_worker_count(self.jobs)))
+
+        results = map_jobs(Get_Contour_Job, all_entities, self.jobs)
+
+        for entities, (cont, geo) in zip(all_entities, results):
+            entities.cont = cont
+            entities.geo = geo
+
     def Get_Contour(self, entities=None):
         """
         Get_Contour() - Find the best contour the composite geometries
@@ -468,63 +633,52 @@ class ReadDXF():
             p_list.append([p.Layer_Nr, p.be.x, p.be.y, p.point_nr, 0])
             p_list.append([p.Layer_Nr, p.en.x, p.en.y, p.point_nr, 1])
 
-        #Sort the list
-        p_list.sort()
-        #print p_list
+        #Sort the points into a grid with the tolerance as cell size, so
+        #common points can only be found in the same or neighbouring cells
+        if tol > 0:
+            cell_size = tol
+        else:
+            cell_size = 1.0
+
+        grid = {}
+        for p_entry in p_list:
+            key = (p_entry[0],
+                   int(floor(p_entry[1] / cell_size)),
+                   int(floor(p_entry[2] / cell_size)))
+            if key in grid:
+                grid[key].append(p_entry)
+            else:
+                grid[key] = [p_entry]
 
-        #Loop for number of list items
-        #Start = where to begin the search of the same elements
-        anf = []
+        for p_entry in p_list:
+            layer_nr, x, y = p_entry[0:3]
+            x_cell = int(floor(x / cell_size))
+            y_cell = int(floor(y / cell_size))
 
-        for l_nr in range(len(p_list)):
+            #Search the neighbouring cells for points within the tolerance
             inter = []
-            #print ("Suche Starten f�r Geometrie Nr: %i, Punkt %i" % (p_list[l_nr][3], l_nr))
+            for x_nr in (x_cell - 1, x_cell, x_cell + 1):
+                for y_nr in (y_cell - 1, y_cell, y_cell + 1):
+                    for c_entry in grid.get((layer_nr, x_nr, y_nr), ()):
+                        if (c_entry is not p_entry) and \
+                           (abs(c_entry[1] - x) <= tol) and \
+                           (abs(c_entry[2] - y) <= tol):
+                            inter.append(c_entry)
 
-            if type(anf) is list:
-                c_nr = 0
-            else:
-                c_nr = anf
-
-            anf = []
-
-            #Schleife bis n�chster X Wert Gr��er ist als selbst +tol und Layer Gr��er gleich
-            #Loop until the next X value is greater than yourself and layer Gr + tol he same ???
-            while (p_list[c_nr][0] < p_list[l_nr][0]) | \
-                  (p_list[c_nr][1] <= (p_list[l_nr][1] + tol)):
-                #print ("Suche Punkt %i" % (c_nr))
-
-                #Erstes das �bereinstimmt is der n�chste Anfang
-                #First, the match is the next start
-                if (type(anf) is list) & \
-                   (p_list[c_nr][0] == p_list[l_nr][0]) & \
-                   (abs(p_list[c_nr][1] - p_list[l_nr][1]) <= tol):
-                    anf = c_nr
-                    #print ("N�chste Suche starten bei" +str(anf))
-
-                #Falls gleich anh�ngen
-                #Attach if equal ???
-                if  (p_list[c_nr][0] == p_list[l_nr][0]) & \
-                    (abs(p_list[c_nr][1] - p_list[l_nr][1]) <= tol) & \
-                    (abs(p_list[c_nr][2] - p_list[l_nr][2]) <= tol) & \
-                    (c_nr != l_nr):
-                    inter.append(c_nr)
-                    #print ("Gefunden" +str(inter))
-                c_nr += 1
-
-                if c_nr == len(p_list):
-                    break
+            #Keep the order of the sorted points
+            inter.sort()
 
             #Anh�ngen der gefundenen Punkte an points
             #Append the found points
-            for int_p in inter:
+            for c_entry in inter:
                 #Common Anfangspunkt
                 #Common starting point
-                if p_list[l_nr][-1] == 0:
-                    points[p_list[l_nr][-2]].be_cp.append(p_list[int_p][3:5])
+                if p_entry[-1] == 0:
+                    points[p_entry[-2]].be_cp.append(c_entry[3:5])
                 #Common Endpunkt
                 #Common end point
                 else:
-                    points[p_list[l_nr][-2]].en_cp.append(p_list[int_p][3:5])
+                    points[p_entry[-2]].en_cp.append(c_entry[3:5])
 
         return points
 
@@ -556,25 +710,35 @@ class ReadDXF():
         Search_Contours() - Find the best continuous contours
         """
 
-        points = deepcopy(all_points)
+        #Copy the points with own lists of the common points, these lists
+        #are reduced during the search. The points are kept by their number
+        #in the order of all_points, so used points are removed in O(1).
+        points = OrderedDict()
+        for p in all_points:
+            points[p.point_nr] = PointsClass(point_nr=p.point_nr, geo_nr=p.geo_nr,
+                                             Layer_Nr=p.Layer_Nr, be=p.be, en=p.en,
+                                             be_cp=p.be_cp[:], en_cp=p.en_cp[:])
 
         while(len(points)) > 0:
+            #The first of the remaining points
+            first_p = points.itervalues().next()
+
             #If nothing found then count up the contour
-            if (len(points[0].be_cp) == 0) & (len(points[0].en_cp) == 0):
+            if (len(first_p.be_cp) == 0) & (len(first_p.en_cp) == 0):
                 #print '\nGibt Nix'
-                cont.append(ContourClass(len(cont), 0, [[points[0].point_nr, 0]], 0))
-            elif (len(points[0].be_cp) == 0) & (len(points[0].en_cp) > 0):
+                cont.append(ContourClass(len(cont), 0, [[first_p.point_nr, 0]], 0))
+            elif (len(first_p.be_cp) == 0) & (len(first_p.en_cp) > 0):
                 #print '\nGibt was R�ckw�rts (Anfang in neg dir)'
-                new_cont_pos = self.Search_Paths(0, [], points[0].point_nr, 0, points)
+                new_cont_pos = self.Search_Paths(0, [], first_p.point_nr, 0, points)
                 cont.append(self.Get_Best_Contour(len(cont), new_cont_pos, geo, points))
-            elif (len(points[0].be_cp) > 0) & (len(points[0].en_cp) == 0):
+            elif (len(first_p.be_cp) > 0) & (len(first_p.en_cp) == 0):
                 #print '\nGibt was Vorw�rt (Ende in pos dir)'
-                new_cont_neg = self.Search_Paths(0, [], points[0].point_nr, 1, points)
+                new_cont_neg = self.Search_Paths(0, [], first_p.point_nr, 1, points)
                 cont.append(self.Get_Best_Contour(len(cont), new_cont_neg, geo, points))
-            elif (len(points[0].be_cp)>0) & (len(points[0].en_cp)>0):
+            elif (len(first_p.be_cp)>0) & (len(first_p.en_cp)>0):
                 #print '\nGibt was in beiden Richtungen'
                 #Search the possible paths
-                new_cont_pos = self.Search_Paths(0, [], points[0].point_nr, 1, points)
+                new_cont_pos = self.Search_Paths(0, [], first_p.point_nr, 1, points)
                 #Determine the best path and Xbergabe in cont ???
                 cont.append(self.Get_Best_Contour(len(cont), new_cont_pos, geo, points))
                 #points = self.Remove_Used_Points(cont[-1], points)
@@ -584,13 +748,13 @@ class ReadDXF():
                     #print '\nPfad nicht durch den ersten Punkt geschlossen'
                     cont[-1].reverse()
                     #print ("Neue Kontur umgedrejt %s" % cont[-1])
-                    new_cont_neg = self.Search_Paths(0, [cont[-1]], points[0].point_nr, 0, points)
+                    new_cont_neg = self.Search_Paths(0, [cont[-1]], first_p.point_nr, 0, points)
                     cont[-1] = self.Get_Best_Contour(len(cont)-1, new_cont_neg+new_cont_pos, geo, points)
 
             else:
                 print 'FEHLER !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!'
 
-            points = self.Remove_Used_Points(cont[-1], points)
+            points = self.Remove_Used_Points(cont[-1], points, all_points)
 
             cont[-1] = self.Contours_Points2Geo(cont[-1], all_points)
         return cont
@@ -598,6 +762,9 @@ class ReadDXF():
     def Search_Paths(self, c_nr=None, c=None, p_nr=None, dir=None, points=None):
         """
         Search_Paths() - Search the paths through the Contour
+        The paths are followed with an explicit stack instead of recursion.
+        A branch gets a copy of the order of its contour (reverse() changes
+        the entries in place), the contour objects themselves aren't copied.
         """
 
         #Define the direction of the search (1 = positive, 0 = neg or reverse)
@@ -606,49 +773,97 @@ class ReadDXF():
         if len(c) == 0:
             c.append(ContourClass(cont_nr=0, order=[[p_nr, dir]]))
 
-        #Suchen des Punktes innerhalb der points List (n�tig da verwendete Punkte gel�scht werden)
-        #Search for the item within the list of points (ntig used as points gelscht) ???
-        for new_p_nr in range(len(points)):
-            if points[new_p_nr].point_nr == p_nr:
-                break
+        #First position of each point in the order of the contours
+        firsts = []
+        for cont in c:
+            first = {}
+            for i in range(len(cont.order)):
+                first.setdefault(cont.order[i][0], i)
+            firsts.append(first)
+
+        #Each entry of the stack is a contour with its branches and the next
+        #branch to follow
+        stack = []
+        call = [c_nr, p_nr, dir]
+        while (call is not None) or (len(stack) > 0):
+            if call is not None:
+                c_nr, p_nr, dir = call
+                call = None
+
+                #Next point depending on the direction
+                #Suchen des Punktes innerhalb der points (n�tig da verwendete Punkte gel�scht werden)
+                #Search the point within points (needed as used points are deleted)
+                if p_nr in points:
+                    point = points[p_nr]
+                else:
+                    point = points[next(reversed(points))]
+                if dir == 0:
+                    weiter = point.en_cp
+                elif dir == 1:
+                    weiter = point.be_cp
+
+                #Schleife f�r die Anzahl der Abzweig M�glichkeiten
+                #Loop for the number of the branch possibilities
+                for i in range(len(weiter)):
+                    if self.Is_Path_Closed(c[c_nr], firsts[c_nr]):
+                        continue
+
+                    #Wenn es die erste M�glichkeit ist Hinzuf�gen zur aktuellen Kontur
+                    #If it is the first possibility to add to the current contour
+                    if i == 0:
+                        order = c[c_nr].order
+                        order.append(weiter[0])
+                        firsts[c_nr].setdefault(weiter[0][0], len(order) - 1)
+
+                    #There is a branch.  It is copied to the current contour and the
+                    #other branches follow
+                    else:
+                        #print 'Abzweig ist m�glich'
+                        order = []
+                        for entry in c[c_nr].order[:-1]:
+                            order.append([entry[0], entry[1]])
+                        first = firsts[c_nr].copy()
+                        if first[c[c_nr].order[-1][0]] == len(order):
+                            del first[c[c_nr].order[-1][0]]
+                        order.append(weiter[i])
+                        first.setdefault(weiter[i][0], len(order) - 1)
+
+                        c.append(ContourClass(c[c_nr].cont_nr, c[c_nr].closed,
+                                              order, c[c_nr].length))
+                        firsts.append(first)
+
+                stack.append([c_nr, weiter, 0])
+
+            c_nr, weiter, i = stack[-1]
+            if i == len(weiter):
+                stack.pop()
+                continue
+            stack[-1][2] = i + 1
 
-        #Next point depending on the direction
-        if dir == 0:
-            weiter = points[new_p_nr].en_cp
-        elif dir == 1:
-            weiter = points[new_p_nr].be_cp
-
-        #Schleife f�r die Anzahl der Abzweig M�glichkeiten
-        #Loop for the number of the branch can write ???
-        for i in range(len(weiter)):
-            #Wenn es die erste M�glichkeit ist Hinzuf�gen zur aktuellen Kontur
-            #If it is the first possibility to add to the current contour
-            if i == 0:
-                if not(c[c_nr].is_contour_closed()):
-                    c[c_nr].order.append(weiter[0])
-
-            #There is a branch.  It is copied to the current contour and the
-            #other branches follow
-            elif i > 0:
-                if not(c[c_nr].is_contour_closed()):
-                    #print 'Abzweig ist m�glich'
-                    c.append(deepcopy(c[c_nr]))
-                    del c[-1].order[-1]
-                    c[-1].order.append(weiter[i])
-
-        for i in range(len(weiter)):
             #print 'I ist: ' +str(i)
             if i == 0:
                 new_c_nr = c_nr
             else:
                 new_c_nr = len(c) - len(weiter) + i
 
-            new_p_nr = c[new_c_nr].order[-1][0]
-            new_dir = c[new_c_nr].order[-1][1]
-            if not(c[new_c_nr].is_contour_closed()):
-                c = self.Search_Paths(copy(new_c_nr), c, copy(new_p_nr), copy(new_dir), points)
+            if not(self.Is_Path_Closed(c[new_c_nr], firsts[new_c_nr])):
+                call = [new_c_nr, c[new_c_nr].order[-1][0], c[new_c_nr].order[-1][1]]
+
         return c
 
+    def Is_Path_Closed(self, cont=None, first=None):
+        """
+        Is_Path_Closed() - Same as cont.is_contour_closed() but uses the first
+        positions of the points in the order instead of searching the order
+        """
+        j = first[cont.order[-1][0]]
+        if j < len(cont.order) - 1:
+            if j == 0:
+                cont.closed = 1
+            else:
+                cont.closed = 2
+        return cont.closed
+
     def Get_Best_Contour(self, c_nr, c=None, geo=None, points=None):
         """
         Get_Best_Contour() - Seek for the best (in my opinion) countour
@@ -699,18 +914,29 @@ class ReadDXF():
         return best_c
 
     #All the points in the path from Point Clear to accelerate nights Search ???
-    def Remove_Used_Points(self, cont=None, points=None):
+    def Remove_Used_Points(self, cont=None, points=None, all_points=None):
         """
-        Remove_Used_Points()
+        Remove_Used_Points() - Remove the points of the contour and the
+        references to them. Only the common points of the removed point
+        (from all_points) can reference it, so no other points are visited.
         """
         for p_nr in cont.order:
+            if p_nr[0] in points:
+                del points[p_nr[0]]
+
+            #The first reference in each list of the common points
+            used_p = all_points[p_nr[0]]
+            neighbours = set()
+            for cp in used_p.be_cp:
+                neighbours.add(cp[0])
+            for cp in used_p.en_cp:
+                neighbours.add(cp[0])
+
+            for n_nr in neighbours:
+                if n_nr not in points:
+                    continue
+                Point = points[n_nr]
 
-            #This has to be 2 separate loops, otherwise one element is missing
-            for Point in points:
-                if p_nr[0] == Point.point_nr:
-                    del points[points.index(Point)]
-
-            for Point in points:
                 for be_cp in Point.be_cp:
                     if p_nr[0] == be_cp[0]:
                         del Point.be_cp[Point.be_cp.index(be_cp)]
@@ -734,6 +960,21 @@ class ReadDXF():
             cont.order[c_nr][0] = points[cont.order[c_nr][0]].geo_nr
         return cont
 
+def Fit_Geo_Job(entitie_geo):
+    """
+    Fit_Geo_Job() - Worker job of Fit_Geos
+    @return: the fitted geometries of the spline or ellipse
+    """
+    return entitie_geo.calc_geo()
+
+def Get_Contour_Job(entities):
+    """
+    Get_Contour_Job() - Worker job of Get_Contours_Parallel
+    @return: the contours and the geometries of the entities
+    """
+    cont = ReadDXF().Get_Contour(entities)
+    return cont, entities.geo
+
 class dxflinepairClass:
     def __init__(self, code=None, value=None):
         self.code = code
@@ -741,32 +982,134 @@ class dxflinepairClass:
     def __str__(self):
         return 'Code ->' + str(self.code) + '\nvalue ->' + self.value
 
+class dxflinepairsViewClass:
+    """
+    Read only list view of the line pairs, the pairs are created on access
+    """
+    def __init__(self, line_pairs):
+        self.line_pairs = line_pairs
+    def __len__(self):
+        return len(self.line_pairs.codes)
+    def __getitem__(self, i):
+        return dxflinepairClass(self.line_pairs.codes[i], self.line_pairs.get_value(i))
+    def __iter__(self):
+        for i in range(len(self.line_pairs.codes)):
+            yield self[i]
+
 class dxflinepairsClass:
-    def __init__(self, line_pair=[]):
-        self.nrs = 0
-        self.line_pair = line_pair
+    def __init__(self, codes=None, values=None):
+        #The codes and values are stored in separate compact sequences
+        if codes is None:
+            codes = array('h')
+        if values is None:
+            values = []
+        self.codes = codes
+        self.values = values
+        self.nrs = len(codes)
+        self.line_pair = dxflinepairsViewClass(self)
+
+        #Positions of the line pairs per code, built on the first search
+        self.code_pos = None
+        self.both_pos = {}
+        self.indexed_nrs = 0
+
     def __str__(self):
         return 'Number of Line Pairs: ' + str(self.nrs)
 
-    #Search for information in the line pairs (both code & value)
-    #Optional start and end values for the search
-    def index_both(self, code=0, value=0, start=0, stop= -1):
+    def get_value(self, i):
         """
-        index_both()
+        get_value() - Value of the line pair as string
+        """
+        return self.values[i]
+
+    def get_float(self, i):
+        """
+        get_float() - Value of the line pair as float
+        """
+        return float(self.values[i])
+
+    def value_equals(self, i, value):
+        """
+        value_equals() - True if the value of the line pair is value
+        """
+        return self.values[i] == value
+
+    def close(self):
+        """
+        close() - Nothing to release, the values are plain strings
+        """
+        pass
+
+    def build_index(self):
+        """
+        build_index() - Collect the sorted positions of every group code once,
+        so that the searches below are a binary search instead of a scan.
+        The positions are kept in arrays like the starts and ends of the values.
+        """
+        code_pos = {}
+        i = 0
+        for code in self.codes:
+            if code in code_pos:
+                code_pos[code].append(i)
+            else:
+                code_pos[code] = array('l', [i])
+            i += 1
+
+        self.code_pos = code_pos
+        self.both_pos = {}
+        self.indexed_nrs = len(self.codes)
+
+    def get_code_pos(self, code):
+        """
+        get_code_pos() - Sorted positions of all line pairs with the code
+        """
+        if self.code_pos is None or self.indexed_nrs != len(self.codes):
+            self.build_index()
+        return self.code_pos.get(code, [])
+
+    def get_both_pos(self, code, value):
         """
+        get_both_pos() - Sorted positions of all line pairs with code & value.
+        The positions are grouped by value once per code.
+        """
+        if self.code_pos is None or self.indexed_nrs != len(self.codes):
+            self.build_index()
+
+        if code not in self.both_pos:
+            value_pos = {}
+            for i in self.code_pos.get(code, []):
+                value_ = self.get_value(i)
+                if value_ in value_pos:
+                    value_pos[value_].append(i)
+                else:
+                    value_pos[value_] = array('l', [i])
+            self.both_pos[code] = value_pos
 
+        return self.both_pos[code].get(value, [])
+
+    def first_pos(self, positions, start, stop):
+        """
+        first_pos() - First of the sorted positions within start and stop
+        """
         #If stop==-1 then stop at the end of the pairs
         if stop == -1:
-            stop = len(self.line_pair)
+            stop = len(self.codes)
 
-        #Start the search within the specified parameters
-        for i in range(start, stop):
-            if (self.line_pair[i].code == code) & (self.line_pair[i].value == value):
-                return i
+        i = bisect_left(positions, start)
+        if i < len(positions) and positions[i] < stop:
+            return positions[i]
 
         #If nothing found return "None"
         return None
 
+    #Search for information in the line pairs (both code & value)
+    #Optional start and end values for the search
+    def index_both(self, code=0, value=0, start=0, stop= -1):
+        """
+        index_both()
+        """
+        return self.first_pos(self.get_both_pos(code, value), start, stop)
+
     #Sucht nach Code Angaben in den Line Pairs code & value
     #optional mit start und endwert f�r die Suche
     #Search for information in the Line Pairs (both code & value)
@@ -775,18 +1118,83 @@ class dxflinepairsClass:
         """
         index_code()
         """
+        return self.first_pos(self.get_code_pos(code), start, stop)
+
+class dxfmmaplinepairsClass(dxflinepairsClass):
+    """
+    Line pairs of a memory mapped file. Only the codes and the positions of
+    the values are stored, the values are decoded on the first access.
+    """
+    def __init__(self, mm, codes, starts, ends):
+        dxflinepairsClass.__init__(self, codes, None)
+        self.mm = mm
+        self.starts = starts
+        self.ends = ends
+
+        self.value_cache = {}
+        self.float_cache = {}
+
+    def get_value(self, i):
+        """
+        get_value() - Value of the line pair as string, decoded once
+        """
+        try:
+            return self.value_cache[i]
+        except KeyError:
+            value = intern(self.mm[self.starts[i]:self.ends[i]])
+            self.value_cache[i] = value
+            return value
 
-        #If stop == -1 then stop at the end of the pairs
-        if stop == -1:
-            stop = len(self.line_pair)
+    def get_float(self, i):
+        """
+        get_float() - Value of the line pair as float, decoded once
+        """
+        try:
+            return self.float_cache[i]
+        except KeyError:
+            value = float(self.mm[self.starts[i]:self.ends[i]])
+            self.float_cache[i] = value
+            return value
+
+    def value_equals(self, i, value):
+        """
+        value_equals() - True if the value of the line pair is value. It is
+        compared within the mapped file, so no string is created.
+        """
+        start = self.starts[i]
+        return (self.ends[i] - start == len(value) and
+                self.mm.find(value, start, start + len(value)) == start)
 
-        #Start the search within the specified parameters
-        for i in range(start, stop):
-            if (self.line_pair[i].code == code):
-                return i
+    def close(self):
+        """
+        close() - Close the mapped file. Only the values decoded so far can
+        be accessed afterwards.
+        """
+        self.mm.close()
 
-        #If nothing found return "None"
-        return None
+    def get_both_pos(self, code, value):
+        """
+        get_both_pos() - Sorted positions of all line pairs with code & value.
+        The values are compared within the mapped file, so no strings are
+        created for the values which are searched.
+        """
+        if self.code_pos is None or self.indexed_nrs != len(self.codes):
+            self.build_index()
+
+        key = (code, value)
+        if key not in self.both_pos:
+            mm = self.mm
+            starts = self.starts
+            ends = self.ends
+            length = len(value)
+            positions = array('l')
+            for i in self.code_pos.get(code, []):
+                start = starts[i]
+                if ends[i] - start == length and mm.find(value, start, start + length) == start:
+                    positions.append(i)
+            self.both_pos[key] = positions
+
+        return self.both_pos[key]
 
 class LayerClass:
     def __init__(self, Nr=0, name=''):
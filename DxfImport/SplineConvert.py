@@ -33,6 +33,12 @@ from math import atan2
 import logging
 logger = logging.getLogger("DxfImport.SplineConvert")
 
+#NumPy is optional, without it the points are evaluated one by one
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 debug_on = False
 
 class Spline2Arcs:
@@ -42,6 +48,10 @@ class Spline2Arcs:
         self.epsilon_high = self.epsilon * 0.1
         self.segments = 50
 
+        #Number of steps evaluated in advance in one call of the evaluator,
+        #only worth it with NumPy
+        self.lookahead = 8
+
         #NURBS Klasse initialisieren
         self.NURBS = NURBSClass(degree=degree, Knots=Knots,
                                 CPoints=CPoints, Weights=Weights)
@@ -426,6 +436,9 @@ class Spline2Arcs:
         PtsVec = [self.NURBS.NURBS_evaluate(n=1, u=u)]
         step = 0
 
+        #Evaluated steps, key is (u, cur_step) of the step
+        step_pts = {}
+
         #Berechnen bis alle Biarcs berechnet sind
         while(u < u_sect[-1] - min_u):
             step += 1
@@ -437,7 +450,9 @@ class Spline2Arcs:
                 cur_step = u_sect[-1] - (u - cur_step) - min_u
                 u = u_sect[-1] - min_u
 
-            PtVec = self.NURBS.NURBS_evaluate(n=1, u=u)
+            if not((u, cur_step) in step_pts):
+                step_pts = self.calc_step_points(u, cur_step, u_sect[-1], min_u)
+            PtVec, check_Pts = step_pts[(u, cur_step)]
 
             #Aus den letzten 2 Punkten den n�chsten Biarc berechnen
             Biarc = (BiarcClass(PtsVec[-1][0], PtsVec[-1][1], PtVec[0], PtVec[1], nom_tol * 0.5))
@@ -454,7 +469,7 @@ class Spline2Arcs:
                 cur_step = min([cur_step * 2, self.max_step])
                 PtsVec.append(PtVec)
             else:
-                if self.check_biarc_fitting_tolerance(Biarc, max_tol, cur_step, u):
+                if self.check_biarc_fitting_tolerance(Biarc, max_tol, cur_step, u, check_Pts):
                     #print("fit1")
                     PtsVec.append(PtVec)
                     BiarcCurve.append(Biarc)
@@ -471,21 +486,66 @@ class Spline2Arcs:
 
         return BiarcCurve, PtsVec
 
-    def check_biarc_fitting_tolerance(self, Biarc, epsilon, cur_step, u1):
+    def calc_step_points(self, u, cur_step, u_end, min_u):
+        """
+        calc_step_points()
+        Evaluates the end point and the 4 tolerance check points of the step
+        to u and of the following steps, as they are when the biarcs fit.
+        All points are evaluated in one call of the NURBS evaluator.
+        @param u: the end of the step
+        @param cur_step: the length of the step
+        @param u_end: the end of the section
+        @param min_u: the distance kept to the end of the section
+        @return: dict with (u, cur_step) of the steps as key and the end point
+        with tangent and the check points as value
+        """
+        if np is None:
+            #The check points are evaluated when needed
+            return {(u, cur_step): (self.NURBS.NURBS_evaluate(n=1, u=u), None)}
+
+        steps = [(u, cur_step)]
+        while len(steps) < self.lookahead and u < u_end - min_u:
+            cur_step = min([cur_step / 0.7, self.max_step])
+            u += cur_step
+            if u > u_end:
+                cur_step = u_end - (u - cur_step) - min_u
+                u = u_end - min_u
+            steps.append((u, cur_step))
+
+        us = []
+        for u, cur_step in steps:
+            us.append(u)
+            us += self.calc_check_u(cur_step, u)
+
+        Pts = self.NURBS.NURBS_evaluate_array(n=1, us=us)
+
+        step_pts = {}
+        for step_nr in range(len(steps)):
+            step_Pts = Pts[step_nr * 5:step_nr * 5 + 5]
+            step_pts[steps[step_nr]] = (step_Pts[0], [Pt for Pt, tangent in step_Pts[1:]])
+        return step_pts
+
+    def calc_check_u(self, cur_step, u1):
+        """
+        calc_check_u()
+        The 4 u's between u1 - cur_step and u1 for the tolerance check
+        """
+        u0 = u1 - cur_step
+        check_step = cur_step / 5
+        return [u0 + check_step * i for i in range(1, 5)]
+
+    def check_biarc_fitting_tolerance(self, Biarc, epsilon, cur_step, u1, check_Pts=None):
         """
         check_biarc_fitting_tolerance()
         """
         if cur_step > self.min_step:
             u0 = u1 - cur_step
-            check_step = cur_step / 5
-            check_u = []
-            check_Pts = []
+            if check_Pts is None:
+                check_Pts = self.NURBS.NURBS_evaluate_array(n=0, us=self.calc_check_u(cur_step, u1))
             fit_error = []
 
-            for i in range(1, 5):
-                check_u.append(u0 + check_step * i)
-                check_Pts.append(self.NURBS.NURBS_evaluate(n=0, u=check_u[-1]))
-                fit_error.append(Biarc.get_biarc_fitting_error(check_Pts[-1]))
+            for Pt in check_Pts:
+                fit_error.append(Biarc.get_biarc_fitting_error(Pt))
 
             #if debug_on:
             if 0:
@@ -657,6 +717,41 @@ class NURBSClass:
         else:
             return Point
 
+    def NURBS_evaluate_array(self, n=0, us=[]):
+        """
+        Berechnen der Punkte des NURBS und der ersten Ableitung f�r alle u's
+        Gives the same values as NURBS_evaluate for each of the u's, with
+        NumPy all u's are evaluated at once.
+        @param n: 0 for the points only, 1 for the points and tangents
+        @param us: list of the u's
+        @return: list of the Points (n=0) or of [Point, tangent] (n=1)
+        """
+        if np is None or not(self.BSpline.in_spans(us)):
+            return [self.NURBS_evaluate(n=n, u=u) for u in us]
+
+        #Errechnen der Homogenen Punkte bis zur n ten Ableitung
+        HPts = self.BSpline.bspline_ders_evaluate_array(n=n, us=us)
+
+        #Punkte wieder in Normal Koordinaten zur�ck transformieren
+        xs = (HPts[0][:, 0] / HPts[0][:, -1]).tolist()
+        ys = (HPts[0][:, 1] / HPts[0][:, -1]).tolist()
+
+        if n > 0:
+            #    w(u)*A'(u)-w'(u)*A(u)
+            #dPt=---------------------
+            #           w(u)^2
+            #pow as in NURBS_evaluate, it may differ from w*w in the last bit
+            w_sq = np.array([pow(w, 2) for w in HPts[0][:, -1].tolist()])
+            dPts = []
+            for j in range(self.BSpline.CPt_len - 1):
+                dPts.append(((HPts[0][:, -1] * HPts[1][:, j] -
+                              HPts[1][:, -1] * HPts[0][:, j]) / w_sq).tolist())
+
+            return [[Point(x=x, y=y), atan2(dy, dx)]
+                    for x, y, dx, dy in zip(xs, ys, dPts[0], dPts[1])]
+        else:
+            return [Point(x=x, y=y) for x, y in zip(xs, ys)]
+
 
     def CPts_2_HCPts(self):
         """
@@ -685,6 +780,11 @@ class BSplineClass:
         self.CPt_len = len(self.CPts[0])
         self.CPts_len = len(self.CPts)
 
+        #Arrays for the evaluation of many u's at once
+        if np is not None:
+            self.Knots_array = np.array(self.Knots, dtype=float)
+            self.CPts_array = np.array(self.CPts, dtype=float)
+
         #Eingangspr�fung, ober KnotenAnzahl usw. passt
         if  self.Knots_len < self.degree + 1:
             raise ValueError, "degree greater than number of control points."
@@ -749,6 +849,44 @@ class BSplineClass:
 
         return CK
 
+    def bspline_ders_evaluate_array(self, n=0, us=[]):
+        """
+        bspline_ders_evaluate for all u's at once (needs NumPy)
+        @return: list with an array [len(us), CPt_len] for each derivative
+        """
+        us = np.array(us, dtype=float)
+        spans = self.findspan_array(us)
+        dN = self.ders_basis_functions_array(spans, us, n)
+
+        p = self.degree
+        du = min(n, p)
+
+        CK = []
+        for k in range(n + 1):
+            CK.append(np.zeros((len(us), self.CPt_len)))
+
+        for k in range(du + 1):
+            for j in range(p + 1):
+                CK[k] += dN[k][j][:, np.newaxis] * self.CPts_array[spans - p + j]
+
+        return CK
+
+    def in_spans(self, us):
+        """
+        Checks if all u's are within the knots used by findspan_array
+        """
+        return (min(us) >= self.Knots[self.degree]) and (max(us) <= self.Knots[-1])
+
+    def findspan_array(self, us):
+        """
+        findspan for an array of u's by a sorted search in the knots
+        """
+        spans = np.searchsorted(self.Knots_array, us, side='right') - 1
+
+        #Spezialfall wenn der Wert==Endpunkt ist
+        spans[us == self.Knots[-1]] = self.Knots_len - self.degree - 2
+        return spans
+
     def findspan(self, u):
         """
         Algorithm A2.1 from "THE NURBS BOOK" pg.68
@@ -893,3 +1031,75 @@ class BSplineClass:
             r *= (d - k)
         return ders
 
+    def ders_basis_functions_array(self, spans, us, n):
+        """
+        ders_basis_functions with arrays of spans and u's, each element of
+        the matrices is an array with the values for all u's
+        """
+        d = self.degree
+        zeros = np.zeros(len(us))
+
+        a = [[zeros] * (d + 1), [zeros] * (d + 1)]
+        ndu = [[zeros] * (d + 1) for j in range(d + 1)]
+        ders = [[zeros] * (d + 1) for j in range(n + 1)]
+
+        ndu[0][0] = zeros + 1.0
+        left = [zeros]
+        right = [zeros]
+
+        for j in range(1, d + 1):
+            left.append(us - self.Knots_array[spans + 1 - j])
+            right.append(self.Knots_array[spans + j] - us)
+            saved = zeros
+            for r in range(j):
+                #Lower Triangle
+                ndu[j][r] = right[r + 1] + left[j - r]
+                temp = ndu[r][j - 1] / ndu[j][r]
+                #Upper Triangle
+                ndu[r][j] = saved + right[r + 1] * temp
+                saved = left[j - r] * temp
+            ndu[j][j] = saved
+
+        #Load the basis functions
+        for j in range(d + 1):
+            ders[0][j] = ndu[j][d]
+
+        #This section computes the derivatives (Eq. [2.9])
+        for r in range(d + 1):
+            s1 = 0; s2 = 1
+            a[0][0] = zeros + 1.0
+            for k in range(1, n + 1):
+                der = zeros
+                rk = r - k; pk = d - k
+
+                if(r >= k):
+                    a[s2][0] = a[s1][0] / ndu[pk + 1][rk]
+                    der = a[s2][0] * ndu[rk][pk]
+                if (rk >= -1):
+                    j1 = 1
+                else:
+                    j1 = -rk
+                if (r - 1 <= pk):
+                    j2 = k - 1
+                else:
+                    j2 = d - r
+
+                for j in range(j1, j2 + 1):
+                    a[s2][j] = (a[s1][j] - a[s1][j - 1]) / ndu[pk + 1][rk + j]
+                    der = der + a[s2][j] * ndu[rk + j][pk]
+
+                if(r <= pk):
+                    a[s2][k] = -a[s1][k - 1] / ndu[pk + 1][r]
+                    der = der + a[s2][k] * ndu[r][pk]
+
+                ders[k][r] = der
+                j = s1; s1 = s2; s2 = j
+
+        #Multiply through by the correct factors
+        r = d
+        for k in range(1, n + 1):
+            for j in range(d + 1):
+                ders[k][j] = ders[k][j] * r
+            r *= (d - k)
+        return ders
+
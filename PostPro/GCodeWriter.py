@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+############################################################################
+#
+#   Copyright (C) 2015
+#
+#   This file is part of DXF2GCODE.
+#
+#   DXF2GCODE is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   DXF2GCODE is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with DXF2GCODE.  If not, see <http://www.gnu.org/licenses/>.
+#
+############################################################################
+
+"""
+Writers for the exported code.
+
+The Postprocessor writes the code block by block, so the writers for a file
+or STDOUT never hold the whole program. All writers have the methods
+write(exstr) and close().
+"""
+
+import sys
+
+#Size of the file buffer in bytes
+WRITE_BUFFER_SIZE = 1 << 16
+
+
+class FileWriterClass:
+    """
+    Writes the code UTF-8 encoded to a file
+    """
+    def __init__(self, filename):
+        """
+        @param filename: the file to create, may raise IOError
+        """
+        self.file = open(filename, "w", WRITE_BUFFER_SIZE)
+
+    def write(self, exstr):
+        self.file.write(exstr.encode('utf8'))
+
+    def close(self):
+        self.file.close()
+
+
+class StdoutWriterClass:
+    """
+    Writes the code to STDOUT (or another open stream)
+    """
+    def __init__(self, stream=None):
+        if stream is None:
+            stream = sys.stdout
+        self.stream = stream
+
+    def write(self, exstr):
+        self.stream.write(exstr)
+
+    def close(self):
+        #As print did before, the code ends with a new line
+        self.stream.write('\n')
+        self.stream.flush()
+
+
+class StringWriterClass:
+    """
+    Keeps the code in memory, getvalue() returns all of it
+    """
+    def __init__(self):
+        self.parts = []
+
+    def write(self, exstr):
+        self.parts.append(exstr)
+
+    def getvalue(self):
+        return ''.join(self.parts)
+
+    def close(self):
+        pass
+
+
+class LineNumbersWriterClass:
+    """
+    Adds the line numbers to the code and passes it on to the next writer.
+    Each line is only looked at once, so the numbering is linear in the size
+    of the code.
+    """
+    def __init__(self, writer, line_nrs_begin=10, line_nrs_step=10,
+                 line_format='N%i '):
+        """
+        @param writer: the writer which gets the numbered code
+        @param line_nrs_begin: number of the first line
+        @param line_nrs_step: difference of the numbers of two lines
+        @param line_format: the format of the line number
+        """
+        self.writer = writer
+        self.line_nr = line_nrs_begin
+        self.line_nrs_step = line_nrs_step
+        self.line_format = line_format
+
+        #As before, a line which directly follows a numbered empty line
+        #gets no number
+        self.after_line_nr = False
+
+        self.writer.write(self.line_format % self.line_nr)
+
+    def write(self, exstr):
+        lines = exstr.split('\n')
+        numbered = [lines[0]]
+        if lines[0]:
+            self.after_line_nr = False
+
+        for line in lines[1:]:
+            if self.after_line_nr:
+                numbered.append('\n')
+                self.after_line_nr = False
+            else:
+                self.line_nr += self.line_nrs_step
+                numbered.append('\n' + self.line_format % self.line_nr)
+                self.after_line_nr = True
+            numbered.append(line)
+            if line:
+                self.after_line_nr = False
+
+        self.writer.write(''.join(numbered))
+
+    def close(self):
+        self.writer.close()
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+############################################################################
+#
+#   Copyright (C) 2015
+#
+#   This file is part of DXF2GCODE.
+#
+#   DXF2GCODE is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   DXF2GCODE is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with DXF2GCODE.  If not, see <http://www.gnu.org/licenses/>.
+#
+############################################################################
+
+"""
+The motions of an export, independent of the Postprocessor.
+
+write_program() runs through the layers and shapes and calls the methods of
+the PostPro for the motions (rapid and linear moves, arcs, z moves, tool
+and feed changes, comments). Given a MyPostProcessor the code is written
+directly. Given a MotionListClass the calls are recorded, so the geometry
+is calculated only once and each Postprocessor renders the same motions
+with MyPostProcessor.write_motions().
+"""
+
+import Core.Globals as g
+from Core.Point import Point
+
+import logging
+logger = logging.getLogger("PostPro.MotionList")
+
+
+def write_program(PostPro, load_filename, LayerContents):
+    """
+    Writes the code of all layers to PostPro.writer, block by block.
+    @param PostPro: the MyPostProcessor or MotionListClass
+    @param load_filename: The name of the loaded dxf file.
+    @param LayerContents: List of the LayerContent to be exported.
+    """
+    write = PostPro.writer.write
+
+    write(PostPro.write_gcode_be(load_filename))
+
+    #Move Machine to retraction Area before continuing anything.
+    # Note: none of the changes done in the GUI can affect this height,
+    #       only the config file can do so (intended)
+    write(PostPro.rap_pos_z(g.config.vars.Depth_Coordinates['axis3_retract']))
+
+    #Do the export for each LayerContent in LayerContents List
+    for LayerContent in LayerContents:
+        logger.debug(("Beginning export of Layer Nr. %s, Name%s")
+                     % (LayerContent.LayerNr, LayerContent.LayerName))
+        logger.debug(("Nr. of Shapes %s; Nr. of Shapes in Route %s")
+                     % (len(LayerContent.shapes), len(LayerContent.exp_order_complete)))
+
+        #Perform export only for Layers which have at least 1 Shape to export
+
+        write(PostPro.commentprint("*** LAYER: %s ***" %(LayerContent.LayerName)))
+        for shape_nr in LayerContent.exp_order:
+            logger.debug(("Beginning export of  Shape Nr: %s") % shape_nr)
+            write(PostPro.commentprint("* SHAPE Nr: %i *" %(shape_nr)))
+            LayerContent.shapes[shape_nr].Write_GCode(LayerContent=LayerContent,
+                                                      PostPro=PostPro)
+
+    #Move machine to the Final Position
+    EndPosition = Point(x=g.config.vars.Plane_Coordinates['axis1_start_end'],
+                        y=g.config.vars.Plane_Coordinates['axis2_start_end'])
+
+    write(PostPro.rap_pos_xy(EndPosition))
+
+    #Write the end G-Code at the end
+    write(PostPro.write_gcode_en())
+
+
+class MotionListClass:
+    """
+    Records the calls of the MyPostProcessor methods as the list motions of
+    (method name, arguments). The methods return no code. The absolute z
+    position (ze) and the feed are kept as the geometries read them.
+    """
+    def __init__(self):
+        self.motions = []
+        self.writer = self
+
+        self.ze = g.config.vars.Depth_Coordinates['axis3_retract']
+        self.feed = 0
+
+    def add(self, name, *args):
+        self.motions.append((name, args))
+        return ''
+
+    def write(self, exstr):
+        """
+        write()
+        Code given directly (e.g. custom G-Code) is recorded as it is
+        """
+        if exstr:
+            self.motions.append(('write_text', (exstr,)))
+
+    def write_gcode_be(self, load_filename):
+        return self.add('write_gcode_be', load_filename)
+
+    def write_gcode_en(self):
+        return self.add('write_gcode_en')
+
+    def chg_tool(self, tool_nr, speed):
+        return self.add('chg_tool', tool_nr, speed)
+
+    def chg_feed_rate(self, feed):
+        self.feed = feed
+        return self.add('chg_feed_rate', feed)
+
+    def set_cut_cor(self, cut_cor, Pe):
+        return self.add('set_cut_cor', cut_cor, Pe)
+
+    def deactivate_cut_cor(self, Pe):
+        return self.add('deactivate_cut_cor', Pe)
+
+    def arc_pol_xy(self, ext, Ps, Pe, s_ang, e_ang, r, O):
+        return self.add('arc_pol_xy', ext, Ps, Pe, s_ang, e_ang, r, O)
+
+    def lin_pol_arc(self, dir, Ps, Pe, s_ang, e_ang, R, O, IJ):
+        return self.add('lin_pol_arc', dir, Ps, Pe, s_ang, e_ang, R, O, IJ)
+
+    def rap_pos_z(self, z_pos):
+        self.ze = z_pos
+        return self.add('rap_pos_z', z_pos)
+
+    def rap_pos_xy(self, Pe):
+        return self.add('rap_pos_xy', Pe)
+
+    def lin_pol_z(self, z_pos):
+        self.ze = z_pos
+        return self.add('lin_pol_z', z_pos)
+
+    def lin_pol_xy(self, Ps, Pe):
+        return self.add('lin_pol_xy', Ps, Pe)
+
+    def write_pre_shape_cut(self):
+        return self.add('write_pre_shape_cut')
+
+    def write_post_shape_cut(self):
+        return self.add('write_post_shape_cut')
+
+    def commentprint(self, comment):
+        return self.add('commentprint', comment)
+
+    def make_print_str(self, keystr):
+        return self.add('make_print_str', keystr)
@@ -30,6 +30,7 @@ import time
 import re
 
 from math import degrees
+from operator import attrgetter
 
 import Core.constants as c
 import Core.Globals as g
@@ -41,6 +42,109 @@ import logging
 logger = logging.getLogger("PostPro.PostProcessor")
 
 from PostPro.PostProcessorConfig import MyPostProConfig
+from PostPro.GCodeWriter import FileWriterClass, StdoutWriterClass, \
+    StringWriterClass, LineNumbersWriterClass
+from PostPro.MotionList import write_program
+
+
+#Format strings of the numbers for (signed, zero padding, width, decimals)
+number_formats = {}
+
+
+class NumberFormatClass:
+    """
+    Formats the numbers as given in the Number_Format section of a
+    Postprocessor Config File. The settings are read once, format is the
+    fastest of the methods which gives the same string as the general one.
+    """
+    def __init__(self, Number_Format):
+        """
+        @param Number_Format: the Number_Format settings
+        """
+        self.pre_dec = Number_Format["pre_decimals"]
+        self.post_dec = Number_Format["post_decimals"]
+        self.dec_sep = Number_Format["decimal_seperator"]
+        self.pre_dec_z_pad = Number_Format["pre_decimal_zero_padding"]
+        self.post_dec_z_pad = Number_Format["post_decimal_zero_padding"]
+        self.signed_val = Number_Format["signed_values"]
+
+        #+ or - sign if required. Also used for Leading Zeros
+        key = (bool(self.signed_val), bool(self.pre_dec_z_pad),
+               self.pre_dec + self.post_dec + 1, self.post_dec)
+        if not(key in number_formats):
+            flags = ''
+            if self.signed_val:
+                flags += '+'
+            if self.pre_dec_z_pad:
+                flags += '0'
+            number_formats[key] = '%' + flags + str(key[2]) + '.' + str(key[3]) + 'f'
+        self.format_str = number_formats[key]
+
+        #Trailing zeros and the separator are removed, a separator of more
+        #than one character is never removed
+        if len(self.dec_sep) == 1:
+            self.strip_chars = '0' + self.dec_sep
+        else:
+            self.strip_chars = '0'
+
+        if self.post_dec <= 0:
+            self.format = self.format_general
+        elif not(self.post_dec_z_pad):
+            self.format = self.format_stripped
+        elif self.dec_sep == '.':
+            self.format = self.format_fixed
+        else:
+            self.format = self.format_separator
+
+    def format_fixed(self, number):
+        """
+        format_fixed()
+        All decimals with a point as separator, this is just the format
+        string (but not for inf and nan, which have no decimals)
+        """
+        if number - number == 0:
+            return self.format_str % number
+        return self.format_general(number)
+
+    def format_separator(self, number):
+        """
+        format_separator()
+        All decimals with an other separator
+        """
+        numstr = self.format_str % number
+        return numstr[0:-(self.post_dec + 1)] + self.dec_sep + numstr[-self.post_dec:]
+
+    def format_stripped(self, number):
+        """
+        format_stripped()
+        Without the trailing zeros of the decimals
+        """
+        numstr = self.format_str % number
+        return numstr[0:-(self.post_dec + 1)] + \
+            (self.dec_sep + numstr[-self.post_dec:]).rstrip(self.strip_chars)
+
+    def format_general(self, number):
+        """
+        format_general()
+        Gives the number in the format for all settings
+        """
+        post_dec = self.post_dec
+        dec_sep = self.dec_sep
+
+        numstr = self.format_str % number
+
+        #Gives the required decimal format.
+        exstr = numstr[0:-(post_dec + 1)]
+
+        exstr_end = dec_sep
+        exstr_end += numstr[-(post_dec):]
+
+        #Add's Zero's to the end if required
+        if not(self.post_dec_z_pad):
+            while (len(exstr_end) > 0) and ((exstr_end[-1] == '0') \
+                   or (exstr_end[-1] == dec_sep)):
+                exstr_end = exstr_end[0:-1]
+        return exstr + exstr_end
 
 
 class MyPostProcessor():
@@ -123,8 +227,10 @@ class MyPostProcessor():
         PostProConfig = MyPostProConfig(filename=self.postprocessor_files[file_index])
         PostProConfig.load_config()
         self.vars = PostProConfig.vars
+        self.number_format = NumberFormatClass(self.vars.Number_Format)
 
-    def exportShapes(self, load_filename, save_filename, LayerContents):
+    def exportShapes(self, load_filename, save_filename, LayerContents,
+                     writer=None, motion_list=None):
         """
         This function performs the export to a file or stdout.
         It calls the following dedicated export functions and runs
@@ -137,69 +243,59 @@ class MyPostProcessor():
         LayerContent to be exported and the LayerContent itself includes the
         export parameters (e.g. mill depth) and the shapes to be exported. The
         shape order is also given in a list defined in LayerContent.
+        @param writer: The writer of the code (see GCodeWriter). If None the
+        code is written to STDOUT or to the file save_filename.
+        @param motion_list: The motions of the shapes, recorded once for
+        several Postprocessors (see MotionList). If given, load_filename and
+        LayerContents are not used.
         """
 
         self.initialize_export_vars()
 
-        exstr = self.write_gcode_be(load_filename)
-
-        #Move Machine to retraction Area before continuing anything.
-        # Note: none of the changes done in the GUI can affect this height,
-        #       only the config file can do so (intended)
-        exstr += self.rap_pos_z(g.config.vars.Depth_Coordinates['axis3_retract'])
-
-        previous_tool = None
-        #Do the export for each LayerContent in LayerContents List
-        for LayerContent in LayerContents:
-            logger.debug(("Beginning export of Layer Nr. %s, Name%s")
-                         % (LayerContent.LayerNr, LayerContent.LayerName))
-            logger.debug(("Nr. of Shapes %s; Nr. of Shapes in Route %s")
-                         % (len(LayerContent.shapes), len(LayerContent.exp_order_complete)))
-
-            #Perform export only for Layers which have at least 1 Shape to export
-
-            exstr += self.commentprint("*** LAYER: %s ***" %(LayerContent.LayerName))
-            for shape_nr in LayerContent.exp_order:
-                logger.debug(("Beginning export of  Shape Nr: %s") % shape_nr)
-                exstr += self.commentprint("* SHAPE Nr: %i *" %(shape_nr))
-                exstr += LayerContent.shapes[shape_nr].Write_GCode(LayerContent=LayerContent,
-                                           PostPro=self)
-
-        #Move machine to the Final Position
-        EndPosition = Point(x=g.config.vars.Plane_Coordinates['axis1_start_end'],
-                            y=g.config.vars.Plane_Coordinates['axis2_start_end'])
-
-        exstr += self.rap_pos_xy(EndPosition)
+        if writer is None:
+            if g.config.vars.General['write_to_stdout']:
+                writer = StdoutWriterClass()
+            else:
+                try:
+                    writer = FileWriterClass(save_filename)
+                except IOError, e:
+                    logger.error(("Cannot Save the File %s: %s") % (save_filename, e))
+                    return
+
+        #The line numbers are added while the code is written
+        if self.vars.Line_Numbers["use_line_nrs"]:
+            writer = LineNumbersWriterClass(writer,
+                                            self.vars.Line_Numbers["line_nrs_begin"],
+                                            self.vars.Line_Numbers["line_nrs_step"])
+        self.writer = writer
 
+        try:
+            try:
+                if motion_list is None:
+                    write_program(self, load_filename, LayerContents)
+                else:
+                    self.write_motions(motion_list)
+            finally:
+                self.writer = None
+                writer.close()
+        except IOError, e:
+            logger.error(("Cannot Save the File %s: %s") % (save_filename, e))
+            return
 
-        #Write the end G-Code at the end
-        exstr += self.write_gcode_en()
-
-        """
-        FIXME, Need to check this, don't know if it's correct here or not.
-        """
-        exstr = self.make_line_numbers(exstr)
-
-        #If the String shall be given to STDOUT
         if g.config.vars.General['write_to_stdout']:
-            print(exstr)
             logger.info(("Export to STDOUT was successful"))
-            #self.close
-
         else:
-            #Export Data to file
-            try:
-                #File open and write
-                f = open(save_filename, "w")
-                f.write(exstr.encode('utf8'))
-                f.close()
-                logger.info(("Export to FILE was successful"))
-            except IOError:
-                QtGui.QMessageBox.warning(g.window,
-                                          ("Warning during Export"),
-                                          ("Cannot Save the File"))
-
+            logger.info(("Export to FILE was successful"))
 
+    def write_motions(self, motion_list):
+        """
+        Writes the code of the recorded motions to self.writer, block by
+        block. Each motion is done by the method of the same name.
+        @param motion_list: The MotionListClass with the motions
+        """
+        write = self.writer.write
+        for name, args in motion_list.motions:
+            write(getattr(self, name)(*args))
 
     def initialize_export_vars(self):
         """
@@ -234,34 +330,50 @@ class MyPostProcessor():
         self.ze = g.config.vars.Depth_Coordinates['axis3_retract']
         self.lz = self.ze
 
-        self.keyvars = {"%feed":'self.iprint(self.feed)', \
-                        "%speed":'self.iprint(self.speed)', \
-                        "%tool_nr":'self.iprint(self.tool_nr)', \
-                        "%nl":'self.nlprint()', \
-                        "%XE":'self.fnprint(self.Pe.x)', \
-                        "%-XE":'self.fnprint(-self.Pe.x)', \
-                        "%XS":'self.fnprint(self.Ps.x)', \
-                        "%-XS":'self.fnprint(-self.Ps.x)', \
-                        "%YE":'self.fnprint(self.Pe.y*fac)', \
-                        "%-YE":'self.fnprint(-self.Pe.y*fac)', \
-                        "%YS":'self.fnprint(self.Ps.y*fac)', \
-                        "%-YS":'self.fnprint(-self.Ps.y*fac)', \
-                        "%ZE":'self.fnprint(self.ze)', \
-                        "%-ZE":'self.fnprint(-self.ze)', \
-                        "%I":'self.fnprint(self.IJ.x)', \
-                        "%-I":'self.fnprint(-self.IJ.x)', \
-                        "%J":'self.fnprint(self.IJ.y*fac)', \
-                        "%-J":'self.fnprint(-self.IJ.y*fac)', \
-                        "%XO":'self.fnprint(self.O.x)', \
-                        "%-XO":'self.fnprint(-self.O.x)', \
-                        "%YO":'self.fnprint(self.O.y*fac)', \
-                        "%-YO":'self.fnprint(-self.O.y*fac)', \
-                        "%R":'self.fnprint(self.r)', \
-                        "%AngS":'self.fnprint(degrees(self.s_ang))', \
-                        "%-AngS":'self.fnprint(degrees(-self.s_ang))', \
-                        "%AngE":'self.fnprint(degrees(self.e_ang))', \
-                        "%-AngE":'self.fnprint(degrees(-self.e_ang))', \
-                        "%comment":'self.sprint(self.comment)'}
+        if g.config.vars.General['machine_type']=='lathe':
+            fac = 2
+        else:
+            fac = 1
+
+        fnprint = self.number_format.format
+
+        #Each keyword is printed with the print method from the value of the
+        #getter times the factor. Keywords without a getter are constant.
+        self.keyvars = {"%feed":(self.iprint, attrgetter('feed'), 1), \
+                        "%speed":(self.iprint, attrgetter('speed'), 1), \
+                        "%tool_nr":(self.iprint, attrgetter('tool_nr'), 1), \
+                        "%nl":(self.nlprint, None, None), \
+                        "%XE":(fnprint, attrgetter('Pe.x'), 1), \
+                        "%-XE":(fnprint, attrgetter('Pe.x'), -1), \
+                        "%XS":(fnprint, attrgetter('Ps.x'), 1), \
+                        "%-XS":(fnprint, attrgetter('Ps.x'), -1), \
+                        "%YE":(fnprint, attrgetter('Pe.y'), fac), \
+                        "%-YE":(fnprint, attrgetter('Pe.y'), -fac), \
+                        "%YS":(fnprint, attrgetter('Ps.y'), fac), \
+                        "%-YS":(fnprint, attrgetter('Ps.y'), -fac), \
+                        "%ZE":(fnprint, attrgetter('ze'), 1), \
+                        "%-ZE":(fnprint, attrgetter('ze'), -1), \
+                        "%I":(fnprint, attrgetter('IJ.x'), 1), \
+                        "%-I":(fnprint, attrgetter('IJ.x'), -1), \
+                        "%J":(fnprint, attrgetter('IJ.y'), fac), \
+                        "%-J":(fnprint, attrgetter('IJ.y'), -fac), \
+                        "%XO":(fnprint, attrgetter('O.x'), 1), \
+                        "%-XO":(fnprint, attrgetter('O.x'), -1), \
+                        "%YO":(fnprint, attrgetter('O.y'), fac), \
+                        "%-YO":(fnprint, attrgetter('O.y'), -fac), \
+                        "%R":(fnprint, attrgetter('r'), 1), \
+                        "%AngS":(self.dprint, attrgetter('s_ang'), 1), \
+                        "%-AngS":(self.dprint, attrgetter('s_ang'), -1), \
+                        "%AngE":(self.dprint, attrgetter('e_ang'), 1), \
+                        "%-AngE":(self.dprint, attrgetter('e_ang'), -1), \
+                        "%comment":(self.sprint, attrgetter('comment'), 1)}
+
+        #The longest keywords first, so that e.g. %-XE isn't read as %-
+        keys = sorted(self.keyvars.keys(), key=len, reverse=True)
+        self.keyvars_re = re.compile('|'.join([re.escape(key) for key in keys]))
+
+        #The templates are compiled when they are used the first time
+        self.templates = {}
 
     def write_gcode_be(self, load_filename):
         """
@@ -307,23 +419,13 @@ class MyPostProcessor():
         numbers are added.
         @return: It returns the string with line numbers added to it.
         """
-        use_line_nrs   = self.vars.Line_Numbers["use_line_nrs"]
-        line_nrs_begin = self.vars.Line_Numbers["line_nrs_begin"]
-        line_nrs_step  = self.vars.Line_Numbers["line_nrs_step"]
-
-        line_format = 'N%i '
-        if use_line_nrs:
-            nr = 0
-            line_nr = line_nrs_begin
-            exstr = ((line_format + '%s') % (line_nr, exstr))
-            nr = exstr.find('\n', nr)
-            while not(nr == -1):
-                line_nr += line_nrs_step
-                exstr = (('%s' + line_format + '%s') % (exstr[0:nr + 1], \
-                                                        line_nr, \
-                                                        exstr[nr + 1:len(exstr)]))
-
-                nr = exstr.find('\n', nr + len(((line_format) % line_nr)) + 2)
+        if self.vars.Line_Numbers["use_line_nrs"]:
+            numbered = StringWriterClass()
+            writer = LineNumbersWriterClass(numbered,
+                                            self.vars.Line_Numbers["line_nrs_begin"],
+                                            self.vars.Line_Numbers["line_nrs_step"])
+            writer.write(exstr)
+            exstr = numbered.getvalue()
 
         return exstr
 
@@ -414,6 +516,28 @@ class MyPostProcessor():
             return self.make_print_str(self.vars.Program["arc_int_ccw"])
 
 
+    def arc_pol_xy(self, ext, Ps, Pe, s_ang, e_ang, r, O):
+        """
+        This function is called if an arc shall be cut. Depending on the
+        Postprocessor it is cut as line or with the direction reversed.
+        @param ext: The extend of the arc, the direction is ccw if it is > 0
+        @param Ps: The Start Point of the the Arc
+        @param PE: The End Point of the Arc
+        @param s_ang: The angle at which the Startpoint Starts
+        @param e_ang: The angle at which the Endpoint Ends
+        @param r: The Radius of the Arc
+        @param O: The Center (Origin) of the Arc
+        """
+        # If the radius of the element is bigger than the max, radius export the element as an line.
+        if r > self.vars.General["max_arc_radius"]:
+            return self.lin_pol_xy(Ps, Pe)
+        elif ext > 0:
+            return self.lin_pol_arc("ccw", Ps, Pe, s_ang, e_ang, r, O, O - Ps)
+        elif ext < 0 and self.vars.General["export_ccw_arcs_only"]:
+            return self.lin_pol_arc("ccw", Pe, Ps, e_ang, s_ang, r, O, O - Pe)
+        else:
+            return self.lin_pol_arc("cw", Ps, Pe, s_ang, e_ang, r, O, O - Ps)
+
     def rap_pos_z(self, z_pos):
         """
         Code to add if the machine is rapidly commanded to a new
@@ -491,6 +615,13 @@ class MyPostProcessor():
         """
         return self.make_print_str(self.vars.Program["post_shape_cut"])
 
+    def write_text(self, exstr):
+        """
+        Return the text as it is (e.g. custom G-Code).
+        @return: Returns the string to be added.
+        """
+        return exstr
+
     def commentprint(self, comment):
         """
         This function is called to print a comment.
@@ -499,6 +630,31 @@ class MyPostProcessor():
         self.comment = comment
         return self.make_print_str(self.vars.Program["comment"])
 
+    def compile_template(self, keystr):
+        """
+        Splits the template into the literal text and the keywords.
+        @param keystr: String with the keywords of the Postprocessor
+        Configuration
+        @return: The format string of the literal text, with %s for each
+        keyword, and the list of the keyvars of the keywords.
+        """
+        format_str = ''
+        accessors = []
+        pos = 0
+        for match in self.keyvars_re.finditer(keystr):
+            format_str += keystr[pos:match.start()].replace('%', '%%')
+            pos = match.end()
+
+            print_value, get_value, factor = self.keyvars[match.group()]
+            if get_value is None:
+                format_str += print_value().replace('%', '%%')
+            else:
+                format_str += '%s'
+                accessors.append((print_value, get_value, factor))
+        format_str += keystr[pos:].replace('%', '%%')
+
+        return format_str, accessors
+
     def make_print_str(self, keystr):
         """
         This is the main function which converts the Keyvalues given in the
@@ -508,17 +664,19 @@ class MyPostProcessor():
         @return: Returns the string with replaced keyvars (e.g. %Z is replaced
         by the real Z value in the defined Number Format.
         """
-
-        if g.config.vars.General['machine_type']=='lathe':
-            fac = 2
-        else:
-            fac = 1
-
-        exstr = keystr
-        for key_nr in range(len(self.keyvars.keys())):
-            exstr = exstr.replace(self.keyvars.keys()[key_nr], \
-                                  eval(self.keyvars.values()[key_nr]))
-        return exstr
+        try:
+            format_str, accessors = self.templates[keystr]
+        except KeyError:
+            format_str, accessors = self.compile_template(keystr)
+            self.templates[keystr] = (format_str, accessors)
+
+        values = []
+        for print_value, get_value, factor in accessors:
+            if factor == 1:
+                values.append(print_value(get_value(self)))
+            else:
+                values.append(print_value(get_value(self) * factor))
+        return format_str % tuple(values)
 
     #Function which returns the given value as a formatted integer
     def iprint(self, integer):
@@ -539,6 +697,14 @@ class MyPostProcessor():
 
 
 
+    def dprint(self, angle):
+        """
+        This method returns an angle in degrees formatted as a string
+        @param angle: The angle in radians
+        @return: The formatted string of the angle in degrees.
+        """
+        return self.fnprint(degrees(angle))
+
     def nlprint(self):
         """
         This function is used to generate a new line.
@@ -553,44 +719,7 @@ class MyPostProcessor():
         @param number: The number which shall be returned in a formatted string
         @return: The formatted string of the number.
         """
-
-        "You need to change Nr. Format here!!"
-
-        pre_dec  = self.vars.Number_Format["pre_decimals"]
-        post_dec = self.vars.Number_Format["post_decimals"]
-        dec_sep  = self.vars.Number_Format["decimal_seperator"]
-        pre_dec_z_pad = self.vars.Number_Format["pre_decimal_zero_padding"]
-        post_dec_z_pad = self.vars.Number_Format["post_decimal_zero_padding"]
-        signed_val = self.vars.Number_Format["signed_values"]
-
-        exstr = ''
-
-        #+ or - sign if required. Also used for Leading Zeros
-        if (signed_val) and (pre_dec_z_pad):
-            numstr = (('%+0' + str(pre_dec + post_dec + 1) + \
-                     '.' + str(post_dec) + 'f') % number)
-        elif (signed_val == 0) and (pre_dec_z_pad):
-            numstr = (('%0' + str(pre_dec + post_dec + 1) + \
-                    '.' + str(post_dec) + 'f') % number)
-        elif (signed_val) and (pre_dec_z_pad == 0):
-            numstr = (('%+' + str(pre_dec + post_dec + 1) + \
-                    '.' + str(post_dec) + 'f') % number)
-        elif (signed_val == 0) and (pre_dec_z_pad == 0):
-            numstr = (('%' + str(pre_dec + post_dec + 1) + \
-                    '.' + str(post_dec) + 'f') % number)
-
-        #Gives the required decimal format.
-        exstr += numstr[0:-(post_dec + 1)]
-
-        exstr_end = dec_sep
-        exstr_end += numstr[-(post_dec):]
-
-        #Add's Zero's to the end if required
-        if not(post_dec_z_pad):
-            while (len(exstr_end) > 0) and ((exstr_end[-1] == '0') \
-                   or (exstr_end[-1] == dec_sep)):
-                exstr_end = exstr_end[0:-1]
-        return exstr + exstr_end
+        return self.number_format.format(number)
 
 #    def __str__(self):
 #
@@ -601,3 +730,18 @@ class MyPostProcessor():
 #                str = str + "\n   -> %s=%s" % (option, self.parser.get(section, option))
 #        return str
 
+
+def Export_Job(args):
+    """
+    Export_Job() - Worker job of Main.exportAllFormats, writes the motions with
+    one Postprocessor to its file
+    @param args: (index of the Postprocessor Config File, name of the file
+    to write, MotionListClass)
+    @return: the name of the written file
+    """
+    file_index, save_filename, motion_list = args
+
+    PostPro = MyPostProcessor()
+    PostPro.getPostProVars(file_index)
+    PostPro.exportShapes(None, save_filename, None, motion_list=motion_list)
+    return save_filename
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+############################################################################
+#
+#   Copyright (C) 2015
+#
+#   This file is part of DXF2GCODE.
+#
+#   DXF2GCODE is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   DXF2GCODE is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with DXF2GCODE.  If not, see <http://www.gnu.org/licenses/>.
+#
+############################################################################
+
+"""
+Cache of optimized routes on disk.
+
+Each route is one small text file named by a hash of the start and end
+points of the shapes and of the Route_Optimisation settings. The least
+recently used files are removed when the cache gets bigger than its size.
+"""
+
+import os
+import hashlib
+
+import logging
+logger = logging.getLogger("PostPro.RouteCache")
+
+#Changes of the key or of the file format invalidate the old files
+CACHE_FORMAT = 1
+CACHE_EXTENSION = '.route'
+
+
+class RouteCacheClass:
+    """
+    Optimized routes of the layers, stored in the folder
+    """
+    def __init__(self, folder, max_size):
+        """
+        @param folder: folder of the cache files, created if missing
+        @param max_size: size of all cache files in bytes
+        """
+        self.folder = folder
+        self.max_size = max_size
+
+        if not(os.path.isdir(self.folder)):
+            try:
+                os.makedirs(self.folder)
+            except OSError, e:
+                logger.warning("Route cache disabled, cannot create %s: %s" % (self.folder, e))
+                self.max_size = 0
+
+    def make_key(self, st_end_points, settings):
+        """
+        make_key()
+        @param st_end_points: the start and end points given to TSPoptimize
+        @param settings: the Route_Optimisation settings
+        @return: the hash of the points and the settings
+        """
+        key = hashlib.sha1("%i\n" % CACHE_FORMAT)
+        for name in sorted(settings):
+            if name != 'route_cache_size':
+                key.update("%s=%r\n" % (name, settings[name]))
+        for st_end in st_end_points:
+            key.update("%r %r %r %r\n" % (st_end[0].x, st_end[0].y, st_end[1].x, st_end[1].y))
+        return key.hexdigest()
+
+    def get_filename(self, key):
+        return os.path.join(self.folder, key + CACHE_EXTENSION)
+
+    def get_route(self, key, shape_nrs):
+        """
+        get_route()
+        @param shape_nrs: number of shapes in the route, the cached route is
+        only used if it is a route through all of them
+        @return: the route or None if it is not in the cache
+        """
+        if not(self.max_size):
+            return None
+
+        filename = self.get_filename(key)
+        try:
+            f = open(filename, 'r')
+            try:
+                route = [int(nr) for nr in f.read().split()]
+            finally:
+                f.close()
+        except (IOError, ValueError):
+            return None
+
+        if sorted(route) != range(shape_nrs):
+            logger.debug("Ignoring invalid cached route %s" % filename)
+            return None
+
+        #Used now, so it is removed last
+        try:
+            os.utime(filename, None)
+        except OSError:
+            pass
+        return route
+
+    def set_route(self, key, route):
+        """
+        set_route()
+        Stores the route and removes the least recently used routes if the
+        cache is too big
+        """
+        if not(self.max_size):
+            return
+
+        filename = self.get_filename(key)
+        try:
+            #Written to a temporary file first, so no half route is read
+            f = open(filename + '.tmp', 'w')
+            f.write(' '.join([str(nr) for nr in route]))
+            f.close()
+            #On Windows rename doesn't replace an existing file
+            if os.path.exists(filename):
+                os.remove(filename)
+            os.rename(filename + '.tmp', filename)
+        except (IOError, OSError), e:
+            logger.warning("Cannot write the route cache file %s: %s" % (filename, e))
+            return
+
+        self.limit_size()
+
+    def limit_size(self):
+        """
+        limit_size()
+        Removes the least recently used files until the cache fits in max_size
+        """
+        files = []
+        cache_size = 0
+        for name in os.listdir(self.folder):
+            if not(name.endswith(CACHE_EXTENSION)):
+                continue
+            filename = os.path.join(self.folder, name)
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, filename, stat.st_size))
+            cache_size += stat.st_size
+
+        files.sort()
+        for mtime, filename, size in files:
+            if cache_size <= self.max_size:
+                break
+            try:
+                os.remove(filename)
+                cache_size -= size
+                logger.debug("Removed %s from the route cache" % filename)
+            except OSError:
+                pass
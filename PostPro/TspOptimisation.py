@@ -23,43 +23,78 @@
 #
 ############################################################################
 
-from copy import copy
-
-from random import random, shuffle
-from math import floor, ceil
+from random import random, shuffle, seed
+from time import time
+from math import floor, ceil, sqrt
+from collections import deque
+import heapq
+import os
+import multiprocessing
+from Queue import Empty
 
 import Core.Globals as g
+from Core.ProcessPool import get_worker_count
 
 import logging
 logger = logging.getLogger("PostPro.TSP")
 
+#NumPy is optional, without it the distance matrix is a list of lists
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 class TSPoptimize():
     """
     Optimize using the Travelling Salesman Problem (TSP) algorithim
     """
-    def __init__(self, st_end_points=[], order=[]):
+    def __init__(self, st_end_points=[], order=[], DistanceMatrix=None):
+        """
+        @param DistanceMatrix: an already generated DistanceMatrixClass for
+        the points (e.g. shared by the islands of TSP_Islands)
+        """
+
+        #The time budget of run() includes the start values
+        self.start_time = time()
 
         self.shape_nrs = len(st_end_points)
         self.iterations = int(self.shape_nrs) * 10
         self.pop_nr = min(int(ceil(self.shape_nrs / 8.0) * 8.0),
                         g.config.vars.Route_Optimisation['max_population'])
         self.mutate_rate = g.config.vars.Route_Optimisation['mutation_rate']
+        self.local_search = g.config.vars.Route_Optimisation['local_search']
+
+        #For very many shapes only the nearest neighbours of the shapes are
+        #used instead of a distance matrix, the genetic algorithm is not done
+        self.sparse = self.shape_nrs > g.config.vars.Route_Optimisation['sparse_shape_nrs']
+
+        #Without genetic algorithm one start route is enough
+        if self.local_search == 'only' or self.sparse:
+            self.pop_nr = 1
+
         self.opt_route = []
         self.order = order
         self.st_end_points = st_end_points
 
         #Generate the Distance Matrix
-        self.DistanceMatrix = DistanceMatrixClass(matrix=[])
-        self.DistanceMatrix.generate_matrix(st_end_points)
+        if DistanceMatrix is not None:
+            self.DistanceMatrix = DistanceMatrix
+        elif self.sparse:
+            logger.info("TSP with candidate lists for %i shapes" % self.shape_nrs)
+            self.DistanceMatrix = CandidateMatrixClass(st_end_points, nei_nr=10)
+        else:
+            self.DistanceMatrix = DistanceMatrixClass(matrix=[])
+            self.DistanceMatrix.generate_matrix(st_end_points)
 
         #Generation Population
         self.Population = PopulationClass(size=[self.shape_nrs, self.pop_nr],
                                          dmatrix=self.DistanceMatrix.matrix,
-                                         pop=[])
+                                         pop=[], st_end_points=st_end_points)
 
         #Initialise the Result Class
         self.Fittness = FittnessClass(population=self.Population,
-                                      cur_fittness=range(self.Population.size[1]))
+                                      cur_fittness=range(self.Population.size[1]),
+                                      best_fittness=[])
         self.Fittness.calc_st_fittness(self.DistanceMatrix.matrix,
                                        range(self.shape_nrs))
         self.Fittness.order = self.order
@@ -77,41 +112,124 @@ class TSPoptimize():
         #Create the first result
         self.Fittness.calc_cur_fittness(self.DistanceMatrix.matrix)
         self.Fittness.select_best_fittness()
-        self.opt_route = self.Population.pop[self.Fittness.best_route]
+        self.opt_route = self.Population.get_route(self.Fittness.best_route)
 
         #ERstellen der 2 opt Optimierungs Klasse
-        #Create the 2 opt optimization class ???
-        #self.optmove=ClassOptMove(dmatrix=self.DistanceMatrix.matrix, nei_nr=int(round(self.shape_nrs/10)))
+        #Create the 2 opt optimization class
+        if self.local_search != 'off':
+            self.optmove = ClassOptMove(dmatrix=self.DistanceMatrix.matrix,
+                                        nei_nr=10, order=self.order)
+            self.improve_best_route()
 
     def calc_next_iteration(self):
         """
         calc_next_iteration()
         """
+        #The local search alone is done after the first route
+        if self.local_search == 'only' or self.sparse:
+            return
+
         #Algorithmus ausfürhen
         # ? Algorithm ???
         self.Population.genetic_algorithm(Result=self.Fittness, mutate_rate=self.mutate_rate)
-        #Für die Anzahl der Tours die Tours nach dem 2-opt Verfahren optimieren
-        #Optimise the number of Tours de Tours to the 2-opt method ???
-##        for pop_nr in range(len(self.Population.pop)):
-##            #print ("Vorher: %0.2f" %self.calc_tour_length(tours[tour_nr]))
-##            self.Population.pop[pop_nr]=self.optmove.do2optmove(self.Population.pop[pop_nr])
-##            #print ("Nachher: %0.2f" %self.calc_tour_length(tours[tour_nr]))
+        #Fittness der jeweiligen Routen aus der Fittness der Eltern
+        #Calculate fitness of each route from the fitness of the parents
+        self.Fittness.calc_child_fittness(self.DistanceMatrix.matrix)
         #Anfang der Reihenfolge immer auf den letzen Punkt legen
         #Always put the last point at the beginning of the sequence
         self.Fittness.set_startpoint()
         #Korrektur Funktion um die Reihenfolge der Elemente zu korrigieren
         #Function to correct the order of the elements
         self.Fittness.correct_constrain_order()
-        #Fittness der jeweiligen Routen ausrechen
-        #Calculate fitness of each route
-        self.Fittness.calc_cur_fittness(self.DistanceMatrix.matrix)
+        #Corrected routes are calculated again
+        if len(self.order):
+            self.Fittness.calc_cur_fittness(self.DistanceMatrix.matrix)
         #Straffunktion falls die Route nicht der gewünschten Reihenfolge entspricht
         #Function if the route is not the desired sequence ???
         #Best route to choose
         self.Fittness.select_best_fittness()
-        self.opt_route = self.Population.pop[self.Fittness.best_route]
+        self.opt_route = self.Population.get_route(self.Fittness.best_route)
+
+        #Die beste Route nach dem 2-opt Verfahren optimieren
+        #Optimise the best route with the 2-opt method
+        if self.local_search == 'polish':
+            self.improve_best_route()
         #logger.debug('Calculation next iteration of TSP: %s' %self)
 
+    def run(self, iterations, max_time=0.0, max_stall=0):
+        """
+        run()
+        Does the iterations and gives the iteration number and the best
+        length (Fittness.best_fittness[-1]) after each of them. Stops early
+        after max_time seconds since the start of the optimisation or after
+        max_stall iterations without a shorter route (0 = no limit).
+        """
+        #Nothing to iterate without genetic algorithm
+        if self.local_search == 'only' or self.sparse:
+            return
+
+        best_length = self.Fittness.best_fittness[-1]
+        stall_nr = 0
+        for it_nr in range(iterations):
+            if max_time > 0 and time() - self.start_time >= max_time:
+                logger.debug("TSP time budget of %0.1fs used up after %i iterations"
+                             % (max_time, it_nr))
+                return
+
+            self.calc_next_iteration()
+            if self.Fittness.best_fittness[-1] < best_length:
+                best_length = self.Fittness.best_fittness[-1]
+                stall_nr = 0
+            else:
+                stall_nr += 1
+            yield it_nr, self.Fittness.best_fittness[-1]
+
+            if max_stall > 0 and stall_nr >= max_stall:
+                logger.debug("TSP route not shorter for %i iterations, stopped after %i"
+                             % (stall_nr, it_nr + 1))
+                return
+
+    def migrate(self, island_nr, routes, lengths, lock):
+        """
+        migrate()
+        Island model: publishes the best route of this population in the
+        shared arrays and takes over the best route of the other islands
+        in place of the worst route, if it is shorter than the own best
+        @param routes: shared array with one route per island
+        @param lengths: shared array with the lengths of these routes
+        """
+        shape_nrs = self.shape_nrs
+        with lock:
+            routes[island_nr * shape_nrs:(island_nr + 1) * shape_nrs] = self.opt_route
+            lengths[island_nr] = self.Fittness.best_fittness[-1]
+
+            best_nr = island_nr
+            for nr in range(len(lengths)):
+                if lengths[nr] < lengths[best_nr]:
+                    best_nr = nr
+            if best_nr == island_nr:
+                return
+            route = routes[best_nr * shape_nrs:(best_nr + 1) * shape_nrs]
+            length = lengths[best_nr]
+
+        worst_nr = self.Fittness.cur_fittness.index(max(self.Fittness.cur_fittness))
+        self.Population.set_route(worst_nr, route)
+        self.Fittness.cur_fittness[worst_nr] = length
+
+    def improve_best_route(self):
+        """
+        improve_best_route()
+        Improves the best route with 2-opt and Or-opt moves, the improved
+        route replaces it in the population
+        """
+        route = self.optmove.do2optmove(self.Population.get_route(self.Fittness.best_route))
+        self.Population.set_route(self.Fittness.best_route, route)
+
+        self.Fittness.cur_fittness[self.Fittness.best_route] = \
+            self.Fittness.calc_lengths(self.DistanceMatrix.matrix, [route])[0]
+        self.Fittness.best_fittness[-1] = self.Fittness.cur_fittness[self.Fittness.best_route]
+        self.opt_route = route
+
     def __str__(self):
         #res = self.Population.pop
         return ("Iteration nrs:    %i" % (self.iterations * 10)) + \
@@ -125,30 +243,84 @@ class TSPoptimize():
 
 class PopulationClass:
     def __init__(self, size=[5, 8], mutate_rate=0.95,
-                 dmatrix=[], pop=[], rot=[], order=[]):
+                 dmatrix=[], pop=[], rot=[], order=[], st_end_points=[]):
 
         self.size = size
         self.mutate_rate = mutate_rate
         self.pop = pop
         self.rot = rot
 
+        #For the fittness of the next population: the population before the
+        #genetic algorithm, the parent of each route (None for crossover) and
+        #the places (first, last) changed by the mutation
+        self.old_pop = []
+        self.parents = [None] * self.size[1]
+        self.edits = [[] for pop_nr in range(self.size[1])]
+
         #logger.debug('The Population size is: %s' %self.size)
 
+        #The nearest neighbour routes are searched in a grid of the points
+        #(without candidate lists), not through the rows of the matrix
+        begin_art = g.config.vars.Route_Optimisation['begin_art']
+        seed_grid = dmatrix
+        if begin_art == 'heuristic' and len(st_end_points) and \
+                not(isinstance(dmatrix, CandidateMatrixClass)):
+            seed_grid = CandidateMatrixClass(st_end_points, nei_nr=0)
+
+        hilbert_tours = {}
         for pop_nr in range(self.size[1]):
             #logger.debug("======= TSP initializing population nr %i =======" % pop_nr)
 
-            if g.config.vars.Route_Optimisation['begin_art'] == 'ordered':
+            if begin_art == 'ordered':
                 self.pop.append(range(size[0]))
-            elif g.config.vars.Route_Optimisation['begin_art'] == 'random':
+            elif begin_art == 'random':
                 self.pop.append(self.random_begin(size[0]))
-            elif g.config.vars.Route_Optimisation['begin_art'] == 'heuristic':
-                self.pop.append(self.heuristic_begin(dmatrix[:]))
+            elif begin_art == 'heuristic':
+                self.pop.append(self.heuristic_begin(seed_grid))
+            elif begin_art == 'hilbert':
+                if not(pop_nr % 8 in hilbert_tours):
+                    hilbert_tours[pop_nr % 8] = self.hilbert_begin(st_end_points, pop_nr % 8)
+                self.pop.append(hilbert_tours[pop_nr % 8][:])
             else:
                 logger.error(('Wrong begin art of TSP choosen'))
 
         for rot_nr in range(size[0]):
             self.rot.append(0)
 
+        #With NumPy the routes are the rows of one array and pos holds the
+        #place of each shape in each route
+        self.pos = None
+        if np is not None and not(isinstance(dmatrix, CandidateMatrixClass)):
+            self.pop = np.array(self.pop, dtype=np.int32)
+            self.update_pos()
+            logger.debug("Population of %i routes in a NumPy array" % self.size[1])
+
+    def update_pos(self):
+        """
+        update_pos()
+        Calculates the places of the shapes in the routes of the array
+        """
+        self.pos = np.empty_like(self.pop)
+        self.pos[np.arange(self.pop.shape[0])[:, np.newaxis], self.pop] = \
+            np.arange(self.pop.shape[1], dtype=np.int32)
+
+    def get_route(self, pop_nr):
+        """
+        get_route()
+        @return: the route as list
+        """
+        if self.pos is None:
+            return self.pop[pop_nr]
+        return self.pop[pop_nr].tolist()
+
+    def set_route(self, pop_nr, route):
+        """
+        set_route()
+        Replaces the route pop_nr by the list route
+        """
+        self.pop[pop_nr] = route
+        if self.pos is not None:
+            self.pos[pop_nr][route] = np.arange(len(route), dtype=np.int32)
 
     def random_begin(self, size):
         """
@@ -158,13 +330,59 @@ class PopulationClass:
         shuffle(tour)
         return tour
 
+    def hilbert_begin(self, st_end_points, variant=0, bits=16):
+        """
+        hilbert_begin for TSP
+        The shapes in the order of their start points along a Hilbert curve
+        over the drawing. The variants 0 to 7 mirror and turn the curve.
+        """
+        xs = [st_end[0].x for st_end in st_end_points]
+        ys = [st_end[0].y for st_end in st_end_points]
+        side = 1 << bits
+        x0 = min(xs)
+        y0 = min(ys)
+        scale = (side - 1) / max(max(xs) - x0, max(ys) - y0, 1e-9)
+
+        keys = []
+        for nr in range(len(st_end_points)):
+            x = int((xs[nr] - x0) * scale)
+            y = int((ys[nr] - y0) * scale)
+            if variant & 1:
+                x = side - 1 - x
+            if variant & 2:
+                y = side - 1 - y
+            if variant & 4:
+                x, y = y, x
+
+            #Place on the curve, the quadrants are turned as the curve goes
+            dis = 0
+            step = side >> 1
+            while step:
+                rx = (x & step) > 0
+                ry = (y & step) > 0
+                dis += step * step * ((3 * rx) ^ ry)
+                if not(ry):
+                    if rx:
+                        x = side - 1 - x
+                        y = side - 1 - y
+                    x, y = y, x
+                step >>= 1
+            keys.append((dis, nr))
+
+        keys.sort()
+        return [nr for dis, nr in keys]
+
     def heuristic_begin(self, dmatrix=[]):
         """
         heuristic_begin for TSP
         """
         tour = []
-        possibilities = range(len(dmatrix[0]))
-        start_nr = int(floor(random()*len(dmatrix[0])))
+        start_nr = int(floor(random()*len(dmatrix)))
+
+        if isinstance(dmatrix, CandidateMatrixClass):
+            return dmatrix.heuristic_tour(start_nr)
+
+        possibilities = range(len(dmatrix))
 
         #Hinzufügen der Nr und entfernen aus possibilies
         #Add and remove the number of possibilities ???
@@ -190,6 +408,10 @@ class PopulationClass:
         min_dist = 1e99
         darray = dmatrix[start]
 
+        if np is not None and isinstance(darray, np.ndarray):
+            #The first of the nearest points, same as the loop below
+            return possibilities[int(np.argmin(darray[possibilities]))]
+
         for pnr in possibilities:
             if (darray[pnr] < min_dist):
                 min_point = pnr
@@ -209,18 +431,22 @@ class PopulationClass:
             new_pop.append([])
 
         #Tournament Selection 1 between Parents (2 Parents remaining)
+        self.parents = [None] * self.size[1]
+        self.edits = [[] for p_nr in range(self.size[1])]
+
         ts_r1 = range(self.size[1])
         shuffle(ts_r1)
         winners_r1 = []
+        winners_r1_nrs = []
         tmp_fittness = []
         for nr in range(self.size[1] / 2):
             if Result.cur_fittness[ts_r1[nr * 2]]\
                < Result.cur_fittness[ts_r1[(nr * 2) + 1]]:
-                winners_r1.append(self.pop[ts_r1[nr * 2]])
-                tmp_fittness.append(Result.cur_fittness[ts_r1[nr * 2]])
+                winners_r1_nrs.append(ts_r1[nr * 2])
             else:
-                winners_r1.append(self.pop[ts_r1[(nr * 2) + 1]])
-                tmp_fittness.append(Result.cur_fittness[ts_r1[(nr * 2) + 1]])
+                winners_r1_nrs.append(ts_r1[(nr * 2) + 1])
+            winners_r1.append(self.pop[winners_r1_nrs[-1]])
+            tmp_fittness.append(Result.cur_fittness[winners_r1_nrs[-1]])
         #print tmp_fittness
 
         #Tournament Selection 2 only one Parent remaining
@@ -229,14 +455,16 @@ class PopulationClass:
         for nr in range(self.size[1] / 4):
             if tmp_fittness[ts_r2[nr * 2]]\
                < tmp_fittness[ts_r2[(nr * 2) + 1]]:
-                winner = winners_r1[ts_r2[nr * 2]]
+                winner_nr = ts_r2[nr * 2]
             else:
-                winner = winners_r1[ts_r2[(nr * 2) + 1]]
+                winner_nr = ts_r2[(nr * 2) + 1]
+            winner = winners_r1[winner_nr]
 
             #Schreiben der Gewinner in die neue Population Matrix
             #print winner
             for pnr in range(2):
                 new_pop[pnr * self.size[1] / 2 + nr] = winner[:]
+                self.parents[pnr * self.size[1] / 2 + nr] = winners_r1_nrs[winner_nr]
 
 
         #Crossover Gens from 2 Parents
@@ -256,18 +484,33 @@ class PopulationClass:
                 indx.sort()
             gens = parent1[indx[0]:indx[1] + 1]
 
-            #Remove the exchanged genes
-            for gen in gens:
-                child.pop(child.index(gen))
+            if self.pos is not None:
+                #Remove the exchanged genes at their places in the child
+                keep = np.ones(self.size[0], dtype=bool)
+                keep[self.pos[winners_r1_nrs[crossover[(nr * 2) + 1]]][gens]] = False
+                child = child[keep]
 
-            #Insert the new genes at a random position
-            ins_indx = int(floor(random()*self.size[0]))
-            new_children = child[0:ins_indx] + gens + child[ins_indx:len(child)]
+                #Insert the new genes at a random position
+                ins_indx = int(floor(random()*self.size[0]))
+                new_children = np.concatenate((child[0:ins_indx], gens, child[ins_indx:len(child)]))
+            else:
+                #Remove the exchanged genes
+                for gen in gens:
+                    child.pop(child.index(gen))
+
+                #Insert the new genes at a random position
+                ins_indx = int(floor(random()*self.size[0]))
+                new_children = child[0:ins_indx] + gens + child[ins_indx:len(child)]
 
             #Write the new children in the new population matrix
             for pnr in range(2):
                 new_pop[int((pnr + 0.5) * self.size[1] / 2 + nr)] = new_children[:]
 
+        #The copies of the array rows are made here, the mutation changes the
+        #routes in place
+        if self.pos is not None:
+            new_pop = np.array(new_pop, dtype=np.int32)
+
         #Mutate the 2nd half of the population matrix
         mutate = range(self.size[1] / 2)
         shuffle(mutate)
@@ -284,18 +527,18 @@ class PopulationClass:
             #Line to be mutated ????
             mutline = new_pop[self.size[1] / 2 + mutate[nr]]
             if random() < 0.75: #Gen Abschnitt umdrehen / Turn gene segment
-                cut = mutline[indx[0]:indx[1] + 1]
-                cut.reverse()
-                mutline = mutline[0:indx[0]] + cut + mutline[indx[1] + 1:len(mutline)]
+                mutline[indx[0]:indx[1] + 1] = mutline[indx[0]:indx[1] + 1][::-1]
+                self.edits[self.size[1] / 2 + mutate[nr]].append((indx[0], indx[1]))
             else: #2 Gene tauschen / 2 Gene exchange
-                orgline = mutline[:]
-                mutline[indx[0]] = orgline[indx[1]]
-                mutline[indx[1]] = orgline[indx[0]]
-            new_pop[self.size[1] / 2 + mutate[nr]] = mutline
+                mutline[indx[0]], mutline[indx[1]] = mutline[indx[1]], mutline[indx[0]]
+                self.edits[self.size[1] / 2 + mutate[nr]] += [(indx[0], indx[0]), (indx[1], indx[1])]
 
 
         #Assign the new population matrix
+        self.old_pop = self.pop
         self.pop = new_pop
+        if self.pos is not None:
+            self.update_pos()
 
     def __str__(self):
         string = ("\nPopulation size: %i X %i \nMutate rate: %0.2f \nRotation Matrix:\n%s \nPop Matrix:" \
@@ -316,15 +559,43 @@ class DistanceMatrixClass:
     def generate_matrix(self, st_end_points):
         """
         generate_matrix()
+        matrix[nr_y][nr_x] is the distance from the end of shape nr_y to the
+        start of shape nr_x. With NumPy the matrix is one float array
+        computed from the coordinate vectors, else a list of lists.
         """
-        x_vals = range(len(st_end_points))
-        self.matrix = []
-        for nr_y in range(len(st_end_points)):
-            for nr_x in range(len(st_end_points)):
-                x_vals[nr_x] = st_end_points[nr_y][1].distance(st_end_points[nr_x][0])
-            self.matrix.append(copy(x_vals[:]))
+        if np is not None:
+            self.matrix = self.generate_array(st_end_points)
+        else:
+            self.matrix = []
+            for nr_y in range(len(st_end_points)):
+                end = st_end_points[nr_y][1]
+                self.matrix.append([end.distance(st_end_points[nr_x][0])
+                                    for nr_x in range(len(st_end_points))])
         self.size = [len(st_end_points), len(st_end_points)]
 
+    def generate_array(self, st_end_points):
+        """
+        generate_array()
+        Distance matrix as NumPy array, the values are the same as the ones
+        of Point.distance (pow(d, 2) is used as there, not d * d)
+        """
+        st_x = np.array([st_end[0].x for st_end in st_end_points], dtype=float)
+        st_y = np.array([st_end[0].y for st_end in st_end_points], dtype=float)
+        en_x = np.array([st_end[1].x for st_end in st_end_points], dtype=float)
+        en_y = np.array([st_end[1].y for st_end in st_end_points], dtype=float)
+
+        matrix = np.empty((len(st_end_points), len(st_end_points)))
+
+        #Blocks of rows, so the temporary arrays stay small
+        for nr_y in range(0, len(st_end_points), 256):
+            rows = matrix[nr_y:nr_y + 256]
+            np.subtract.outer(en_x[nr_y:nr_y + 256], st_x, out=rows)
+            np.power(rows, 2.0, out=rows)
+            dy = np.subtract.outer(en_y[nr_y:nr_y + 256], st_y)
+            rows += np.power(dy, 2.0, out=dy)
+            np.sqrt(rows, out=rows)
+        return matrix
+
     def __str__(self):
         string = ("Distance Matrix; size: %i X %i" % (self.size[0], self.size[1]))
         for line_x in self.matrix:
@@ -333,6 +604,159 @@ class DistanceMatrixClass:
                 string += ("%8.2f" % x_vals)
         return string
 
+class CandidateMatrixClass:
+    """
+    Replaces the distance matrix for very many shapes. The distances are
+    calculated when needed and for each shape only its nearest neighbours
+    are kept as candidates (found through a grid over the start and end
+    points), so the memory grows linear with the number of shapes.
+    With nei_nr=0 it is only the grid for heuristic_tour().
+    """
+    def __init__(self, st_end_points=[], nei_nr=10):
+        self.st_x = [st_end[0].x for st_end in st_end_points]
+        self.st_y = [st_end[0].y for st_end in st_end_points]
+        self.en_x = [st_end[1].x for st_end in st_end_points]
+        self.en_y = [st_end[1].y for st_end in st_end_points]
+        self.size = [len(st_end_points), len(st_end_points)]
+        self.nei_nr = max(min(nei_nr, len(st_end_points) - 1), 0)
+
+        #Used like DistanceMatrixClass, this class stands in for the matrix
+        self.matrix = self
+
+        #Grid with about 2 points per cell
+        all_x = self.st_x + self.en_x
+        all_y = self.st_y + self.en_y
+        self.x0 = min(all_x)
+        self.y0 = min(all_y)
+        extent = max(max(all_x) - self.x0, max(all_y) - self.y0, 1e-9)
+        self.cells = max(int(ceil(sqrt(len(st_end_points) / 2.0))), 1)
+        self.cell_size = float(extent) / self.cells
+
+        #Nearest starts to each end (succ) and nearest ends to each start (pred)
+        if self.nei_nr:
+            self.succ_neighbours = self.calc_neighbours(self.en_x, self.en_y, self.st_x, self.st_y)
+            self.pred_neighbours = self.calc_neighbours(self.st_x, self.st_y, self.en_x, self.en_y)
+        else:
+            self.succ_neighbours = [[] for nr in range(len(st_end_points))]
+            self.pred_neighbours = [[] for nr in range(len(st_end_points))]
+
+    def __len__(self):
+        return self.size[0]
+
+    def __str__(self):
+        return ("Candidate Matrix; size: %i X %i; neighbours: %i"
+                % (self.size[0], self.size[1], self.nei_nr))
+
+    def dist(self, nr_y, nr_x):
+        """
+        Distance from the end of shape nr_y to the start of shape nr_x, the
+        same value as Point.distance gives
+        """
+        return sqrt(pow(self.en_x[nr_y] - self.st_x[nr_x], 2) +
+                    pow(self.en_y[nr_y] - self.st_y[nr_x], 2))
+
+    def calc_tour_length(self, tour):
+        """
+        Length of the closed tour, added up as in FittnessClass
+        """
+        dis = self.dist(tour[-1], tour[0])
+        for nr in range(1, len(tour)):
+            dis += self.dist(tour[nr - 1], tour[nr])
+        return dis
+
+    def get_cell(self, x, y):
+        return (int(floor((x - self.x0) / self.cell_size)),
+                int(floor((y - self.y0) / self.cell_size)))
+
+    def make_grid(self, xs, ys):
+        """
+        Sorts the point numbers into the grid cells
+        """
+        grid = {}
+        for nr in range(len(xs)):
+            key = self.get_cell(xs[nr], ys[nr])
+            if key in grid:
+                grid[key].append(nr)
+            else:
+                grid[key] = [nr]
+        return grid
+
+    def find_nearest(self, grid, x, y, xs, ys, nr_nrs, skip_nr=None):
+        """
+        find_nearest()
+        Searches the grid in rings of cells around x, y until the nearest
+        points are found (points outside ring r are at least r cells away)
+        @return: list of [distance, nr] of the nr_nrs nearest points, equal
+        distances sorted by the number
+        """
+        x_cell, y_cell = self.get_cell(x, y)
+        found = []
+        ring = 0
+        while ring <= self.cells + 1:
+            if ring == 0:
+                keys = [(x_cell, y_cell)]
+            else:
+                keys = []
+                for nr in range(-ring, ring + 1):
+                    keys += [(x_cell + nr, y_cell - ring), (x_cell + nr, y_cell + ring)]
+                for nr in range(-ring + 1, ring):
+                    keys += [(x_cell - ring, y_cell + nr), (x_cell + ring, y_cell + nr)]
+
+            for key in keys:
+                for nr in grid.get(key, ()):
+                    if nr != skip_nr:
+                        found.append([sqrt(pow(x - xs[nr], 2) + pow(y - ys[nr], 2)), nr])
+
+            if len(found) >= nr_nrs:
+                found.sort()
+                if found[nr_nrs - 1][0] < ring * self.cell_size:
+                    break
+            ring += 1
+
+        found.sort()
+        return found[:nr_nrs]
+
+    def calc_neighbours(self, from_x, from_y, to_x, to_y):
+        """
+        calc_neighbours()
+        The nei_nr nearest to points of each from point, the nearest first
+        """
+        grid = self.make_grid(to_x, to_y)
+        neighbours = []
+        for nr in range(len(from_x)):
+            nearest = self.find_nearest(grid, from_x[nr], from_y[nr],
+                                        to_x, to_y, self.nei_nr, nr)
+            neighbours.append([nei_nr for dist, nei_nr in nearest])
+        return neighbours
+
+    def heuristic_tour(self, start_nr):
+        """
+        heuristic_tour()
+        Nearest neighbour tour as PopulationClass.heuristic_begin makes it.
+        The next shape is the first candidate not yet in the tour or else
+        the nearest remaining start found in the grid.
+        """
+        grid = self.make_grid(self.st_x, self.st_y)
+        in_tour = [False] * self.size[0]
+
+        tour = []
+        next_nr = start_nr
+        while next_nr is not None:
+            tour.append(next_nr)
+            in_tour[next_nr] = True
+            grid[self.get_cell(self.st_x[next_nr], self.st_y[next_nr])].remove(next_nr)
+
+            next_nr = None
+            for nei_nr in self.succ_neighbours[tour[-1]]:
+                if not(in_tour[nei_nr]):
+                    next_nr = nei_nr
+                    break
+            if next_nr is None and len(tour) < self.size[0]:
+                next_nr = self.find_nearest(grid, self.en_x[tour[-1]], self.en_y[tour[-1]],
+                                            self.st_x, self.st_y, 1)[0][1]
+        return tour
+
+
 class FittnessClass:
     def __init__(self, population=[], cur_fittness=[], best_fittness=[], best_route=[]):
         self.population = population
@@ -341,24 +765,97 @@ class FittnessClass:
         self.best_route = best_route
 
     def calc_st_fittness(self, matrix, st_pop):
-        dis = matrix[st_pop[-1]][st_pop[0]]
-        for nr in range(1, len(st_pop)):
-            dis += matrix[st_pop[nr - 1]][st_pop[nr]]
-
-        self.best_fittness.append(dis)
+        self.best_fittness.append(self.calc_lengths(matrix, [st_pop])[0])
 
     def calc_cur_fittness(self, matrix):
         #logger.debug("Calculating current fittness len(self.population.pop): %s"
         #             %(len(self.population.pop)))
         #logger.debug("Length of self.cur_fittness: %s" %(len(self.cur_fittness)))
 
-        for pop_nr in range(len(self.population.pop)):
-            pop = self.population.pop[pop_nr]
-            #logger.debug("pop_nr: %s" %pop_nr)
-            dis = matrix[pop[-1]][pop[0]]
-            for nr in range(1, len(pop)):
-                dis += matrix[pop[nr - 1]][pop[nr]]
-            self.cur_fittness[pop_nr] = dis
+        self.cur_fittness[:] = self.calc_lengths(matrix, self.population.pop)
+
+    def calc_child_fittness(self, matrix):
+        """
+        calc_child_fittness()
+        Fittness of the population made by genetic_algorithm() from the
+        fittness of the parents: copied routes keep the length of their
+        parent, for mutated ones only the changed ways are calculated and
+        only the crossover children are calculated completely.
+        """
+        population = self.population
+
+        #A changed way needs two distances, more changed ways than half of
+        #the route are slower than calculating the route completely
+        if isinstance(matrix, CandidateMatrixClass):
+            dist = matrix.dist
+        elif np is not None and isinstance(matrix, np.ndarray):
+            dist = matrix.item
+        else:
+            def dist(nr_y, nr_x):
+                return matrix[nr_y][nr_x]
+
+        new_fittness = []
+        full_nrs = []
+        for pop_nr in range(len(population.pop)):
+            pop = population.pop[pop_nr]
+            parent_nr = population.parents[pop_nr]
+
+            #Ways ending at the changed places and the one after them
+            ways = set()
+            for first, last in population.edits[pop_nr]:
+                ways.update([nr % len(pop) for nr in range(first, last + 2)])
+
+            if parent_nr is None or len(ways) * 2 >= len(pop):
+                full_nrs.append(pop_nr)
+                new_fittness.append(None)
+                continue
+
+            parent = population.old_pop[parent_nr]
+            dis = self.cur_fittness[parent_nr]
+            if population.pos is None:
+                for nr in ways:
+                    dis += dist(pop[nr - 1], pop[nr]) - dist(parent[nr - 1], parent[nr])
+            elif len(ways):
+                ways = np.array(list(ways), dtype=int)
+                dis += float((matrix[pop[ways - 1], pop[ways]] -
+                              matrix[parent[ways - 1], parent[ways]]).sum())
+            new_fittness.append(dis)
+
+        lengths = self.calc_lengths(matrix, [population.pop[pop_nr] for pop_nr in full_nrs])
+        for pop_nr, length in zip(full_nrs, lengths):
+            new_fittness[pop_nr] = length
+        self.cur_fittness[:] = new_fittness
+
+    def calc_lengths(self, matrix, pop):
+        """
+        calc_lengths()
+        @return: list of the lengths of the closed tours in pop
+        """
+        if isinstance(matrix, CandidateMatrixClass):
+            return [matrix.calc_tour_length(tour) for tour in pop]
+        if np is not None and isinstance(matrix, np.ndarray):
+            if not len(pop):
+                return []
+            return self.calc_tour_lengths(matrix, pop)
+
+        lengths = []
+        for tour in pop:
+            dis = matrix[tour[-1]][tour[0]]
+            for nr in range(1, len(tour)):
+                dis += matrix[tour[nr - 1]][tour[nr]]
+            lengths.append(dis)
+        return lengths
+
+    def calc_tour_lengths(self, matrix, pop):
+        """
+        calc_tour_lengths()
+        Lengths of the tours in pop with the distance matrix as NumPy array.
+        The distances are added up in the same order as in calc_cur_fittness.
+        """
+        pop = np.array(pop, dtype=int)
+        dists = np.concatenate((matrix[pop[:, -1], pop[:, 0]][:, np.newaxis],
+                                matrix[pop[:, :-1], pop[:, 1:]]), axis=1)
+        return np.add.accumulate(dists, axis=1)[:, -1].tolist()
 
     #2te Möglichkeit die Reihenfolge festzulegen (Korrekturfunktion=Aktiv)
     #Second option set the order (correction function = Active) ???
@@ -367,6 +864,18 @@ class FittnessClass:
         in begin this might be the best place to change it. Maybe we can also have
         an additional option in the config file?"""
 
+        population = self.population
+        if population.pos is not None:
+            if not(len(self.order)):
+                return
+            #Places of the ordered shapes in each route, sorted, get the
+            #ordered shapes in their order
+            order = np.array(self.order, dtype=np.int32)
+            order_index = np.sort(population.pos[:, order], axis=1)
+            population.pop[np.arange(len(population.pop))[:, np.newaxis], order_index] = order
+            population.update_pos()
+            return
+
         for pop_nr in range(len(self.population.pop)):
             #Search the current order
             order_index = self.get_pop_index_list(self.population.pop[pop_nr])
@@ -381,6 +890,16 @@ class FittnessClass:
         """
         set_startpoint()
         """
+        population = self.population
+        if population.pos is not None:
+            #Each route rotated by the place of the start point
+            n_pts = population.pop.shape[1]
+            places = population.pos[:, n_pts - 1][:, np.newaxis] + np.arange(n_pts)
+            population.pop = population.pop[np.arange(len(population.pop))[:, np.newaxis],
+                                            places % n_pts]
+            population.update_pos()
+            return
+
         n_pts = len(self.population.pop[-1])
         for pop_nr in range(len(self.population.pop)):
             pop = self.population.pop[pop_nr]
@@ -409,3 +928,427 @@ class FittnessClass:
         return ("\nBest Fittness: %s \nBest Route: %s \nBest Pop: %s" \
                 % (self.best_fittness[-1], self.best_route, self.population.pop[self.best_route]))
 
+
+class RouteSumsClass:
+    """
+    Prefix sums of a value for each place of the route. The sums are kept
+    in blocks, so after a change of some places only their blocks and the
+    sums of the blocks are calculated again.
+    """
+    def __init__(self, values, size, block_len=256):
+        """
+        @param values: function which gives the list of values for the places
+        from first up to (not including) last
+        @param size: number of places
+        """
+        self.values = values
+        self.size = size
+        self.block_len = block_len
+        block_nr = size // block_len + 1
+        self.blocks = [[0]] * block_nr
+        self.offsets = [0] * (block_nr + 1)
+        if size:
+            self.update(0, size - 1)
+
+    def update(self, first, last):
+        """
+        update()
+        The values of the places first to last have changed
+        """
+        block_len = self.block_len
+        first_block = first // block_len
+        for block in range(first_block, last // block_len + 1):
+            sums = [0]
+            cur_sum = 0
+            for value in self.values(block * block_len, min((block + 1) * block_len, self.size)):
+                cur_sum += value
+                sums.append(cur_sum)
+            self.blocks[block] = sums
+
+        offsets = self.offsets
+        for block in range(first_block, len(self.blocks)):
+            offsets[block + 1] = offsets[block] + self.blocks[block][-1]
+
+    def prefix(self, nr):
+        """
+        prefix()
+        @return: sum of the values of the places before nr
+        """
+        block = nr // self.block_len
+        return self.offsets[block] + self.blocks[block][nr - block * self.block_len]
+
+
+class ClassOptMove:
+    """
+    Local search for a route: 2-opt moves (a part of the route is run
+    through backwards) and Or-opt moves (1 to 3 shapes are moved to another
+    place of the route). Only moves which connect a shape to one of its
+    nearest neighbours are tried. A shape is only looked at again when the
+    route around it changed (don't look bits).
+    The first shape of the route (the start point) stays in place and the
+    order of the shapes in order is kept.
+    """
+    def __init__(self, dmatrix=[], nei_nr=10, order=[]):
+        self.dmatrix = dmatrix
+        self.order = order
+        self.nei_nr = max(min(nei_nr, len(dmatrix) - 1), 0)
+
+        #Nearest shapes after (succ) and before (pred) each shape
+        if isinstance(dmatrix, CandidateMatrixClass):
+            self.dist = dmatrix.dist
+            self.succ_neighbours = [nei[:self.nei_nr] for nei in dmatrix.succ_neighbours]
+            self.pred_neighbours = [nei[:self.nei_nr] for nei in dmatrix.pred_neighbours]
+        elif np is not None and isinstance(dmatrix, np.ndarray):
+            self.dist = dmatrix.item
+            self.succ_neighbours = self.calc_neighbours(dmatrix)
+            self.pred_neighbours = self.calc_neighbours(dmatrix.T)
+        else:
+            self.dist = self.list_dist
+            self.succ_neighbours = self.calc_neighbours(dmatrix)
+            self.pred_neighbours = self.calc_neighbours(zip(*dmatrix))
+
+        #Sums along the route, see do2optmove()
+        self.ordered = []
+        self.rev_sums = None
+        self.order_sums = None
+
+    def list_dist(self, nr_y, nr_x):
+        return self.dmatrix[nr_y][nr_x]
+
+    def calc_neighbours(self, dmatrix):
+        """
+        calc_neighbours()
+        The nei_nr nearest shapes in each row of the matrix, the nearest
+        first (equal distances by the shape number)
+        """
+        neighbours = []
+        for nr_y in range(len(dmatrix)):
+            row = dmatrix[nr_y]
+            if np is not None and isinstance(row, np.ndarray):
+                row = row.copy()
+                row[nr_y] = np.inf
+                if self.nei_nr < len(row):
+                    max_dist = np.partition(row, self.nei_nr - 1)[self.nei_nr - 1]
+                    cand = np.nonzero(row <= max_dist)[0]
+                else:
+                    cand = np.arange(len(row))
+                cand = cand[np.lexsort((cand, row[cand]))][:self.nei_nr]
+                neighbours.append(cand.tolist())
+            else:
+                nearest = heapq.nsmallest(self.nei_nr, [(row[nr_x], nr_x) for nr_x
+                                                        in range(len(row)) if nr_x != nr_y])
+                neighbours.append([nr_x for dist, nr_x in nearest])
+        return neighbours
+
+    def do2optmove(self, tour):
+        """
+        do2optmove()
+        Improves the tour until no 2-opt or Or-opt move gives a shorter one
+        @param tour: list of the shape numbers, tour[0] is kept in place
+        @return: the improved tour
+        """
+        n = len(tour)
+        if n < 4 or self.nei_nr < 1:
+            return tour[:]
+
+        #Route with the start point at both ends, pos is the place of each shape
+        route = tour + [tour[0]]
+        pos = range(n)
+        for nr in range(n):
+            pos[route[nr]] = nr
+
+        self.ordered = [False] * n
+        for nr in self.order:
+            self.ordered[nr] = True
+
+        #rev_sums: change of length if the route up to a place was run
+        #through backwards, order_sums: number of ordered shapes before a place.
+        #The change of each way is kept at the shape the way starts from.
+        ordered = self.ordered
+        self.rev_dist = [0.0] * n
+        self.set_rev_dist(route, 0, n - 1)
+        rev_dist = self.rev_dist
+
+        def rev_values(first, last):
+            return [rev_dist[nr] for nr in route[first:last]]
+
+        def order_values(first, last):
+            return [ordered[nr] for nr in route[first:last]]
+
+        self.rev_sums = RouteSumsClass(rev_values, n)
+        if len(self.order):
+            self.order_sums = RouteSumsClass(order_values, n + 1)
+        else:
+            self.order_sums = None
+
+        #Don't look bits, all shapes besides the start point are looked at
+        active = [True] * n
+        active[route[0]] = False
+        queue = deque(route[1:n])
+
+        while len(queue):
+            shape_nr = queue.popleft()
+            active[shape_nr] = False
+
+            changed = self.do_2opt(route, pos, shape_nr)
+            if changed is None:
+                changed = self.do_oropt(route, pos, shape_nr)
+            if changed is None:
+                continue
+
+            for nr in changed:
+                if not(active[nr]) and nr != route[0]:
+                    active[nr] = True
+                    queue.append(nr)
+
+        return route[:n]
+
+    def set_rev_dist(self, route, first, last):
+        """
+        set_rev_dist()
+        Calculates the change of length for running the ways from the shapes
+        at the places first to last to their successors backwards
+        """
+        dist = self.dist
+        rev_dist = self.rev_dist
+        for nr in range(first, last + 1):
+            rev_dist[route[nr]] = dist(route[nr + 1], route[nr]) - dist(route[nr], route[nr + 1])
+
+    def changed(self, first, last):
+        """
+        changed()
+        The shapes at the places first to last of the route have moved
+        """
+        self.rev_sums.update(first - 1, last)
+        if self.order_sums is not None:
+            self.order_sums.update(first, last)
+
+    def do_2opt(self, route, pos, shape_nr):
+        """
+        do_2opt()
+        Tries to connect the shape to one of its neighbours by running the
+        part of the route in between backwards
+        @return: the shapes with changed connections or None
+        """
+        dist = self.dist
+        nr = pos[shape_nr]
+
+        #Parts of the route (first and last position) to run backwards
+        moves = []
+
+        #Neighbour after the shape as new successor: the part after the
+        #shape or the part from the shape to the neighbour backwards
+        cur_dist = max(dist(shape_nr, route[nr + 1]), dist(route[nr - 1], shape_nr))
+        for nei_nr in self.succ_neighbours[shape_nr]:
+            if dist(shape_nr, nei_nr) >= cur_dist:
+                break
+            if pos[nei_nr] > nr + 1:
+                moves.append((nr + 1, pos[nei_nr]))
+                moves.append((nr, pos[nei_nr] - 1))
+
+        #Neighbour before the shape as new predecessor
+        for nei_nr in self.pred_neighbours[shape_nr]:
+            if dist(nei_nr, shape_nr) >= cur_dist:
+                break
+            if 0 < pos[nei_nr] < nr - 1:
+                moves.append((pos[nei_nr] + 1, nr))
+                moves.append((pos[nei_nr], nr - 1))
+            elif pos[nei_nr] == 0 and nr > 1:
+                moves.append((1, nr))
+
+        for lo, hi in moves:
+            if lo < 1 or hi >= len(route) - 1:
+                continue
+            order_sums = self.order_sums
+            if order_sums is not None and order_sums.prefix(hi + 1) - order_sums.prefix(lo) > 1:
+                continue
+
+            delta = dist(route[lo - 1], route[hi]) + dist(route[lo], route[hi + 1]) \
+                    - dist(route[lo - 1], route[lo]) - dist(route[hi], route[hi + 1]) \
+                    + self.rev_sums.prefix(hi) - self.rev_sums.prefix(lo)
+            if delta < -1e-9:
+                changed = [route[lo - 1], route[lo], route[hi], route[hi + 1]]
+                route[lo:hi + 1] = route[lo:hi + 1][::-1]
+                for nr in range(lo, hi + 1):
+                    pos[route[nr]] = nr
+                self.set_rev_dist(route, lo - 1, hi)
+                self.changed(lo, hi)
+                return changed
+        return None
+
+    def do_oropt(self, route, pos, shape_nr):
+        """
+        do_oropt()
+        Tries to move 1 to 3 shapes starting with the shape next to one of
+        the neighbours
+        @return: the shapes with changed connections or None
+        """
+        dist = self.dist
+        st_nr = pos[shape_nr]
+        n = len(route) - 1
+
+        for seg_len in range(1, 4):
+            en_nr = st_nr + seg_len - 1
+            if en_nr >= n:
+                break
+            first = route[st_nr]
+            last = route[en_nr]
+
+            #Length saved by taking the shapes out
+            gain = dist(route[st_nr - 1], first) + dist(last, route[en_nr + 1]) \
+                   - dist(route[st_nr - 1], route[en_nr + 1])
+
+            #Places to insert: after a pred neighbour or before a succ neighbour
+            places = []
+            for nei_nr in self.pred_neighbours[first]:
+                if dist(nei_nr, first) >= gain:
+                    break
+                places.append(pos[nei_nr])
+            for nei_nr in self.succ_neighbours[last]:
+                if dist(last, nei_nr) >= gain:
+                    break
+                if nei_nr == route[0]:
+                    places.append(n - 1)
+                else:
+                    places.append(pos[nei_nr] - 1)
+
+            for ins_nr in places:
+                if st_nr - 1 <= ins_nr <= en_nr:
+                    continue
+
+                delta = dist(route[ins_nr], first) + dist(last, route[ins_nr + 1]) \
+                        - dist(route[ins_nr], route[ins_nr + 1]) - gain
+                if delta >= -1e-9:
+                    continue
+
+                #Ordered shapes must not be moved past other ordered shapes
+                order_sums = self.order_sums
+                if order_sums is not None and order_sums.prefix(en_nr + 1) - order_sums.prefix(st_nr):
+                    if ins_nr < st_nr:
+                        passed = order_sums.prefix(st_nr) - order_sums.prefix(ins_nr + 1)
+                    else:
+                        passed = order_sums.prefix(ins_nr + 1) - order_sums.prefix(en_nr + 1)
+                    if passed:
+                        continue
+
+                changed = [route[st_nr - 1], first, last, route[en_nr + 1],
+                           route[ins_nr], route[ins_nr + 1]]
+                segment = route[st_nr:en_nr + 1]
+                if ins_nr < st_nr:
+                    route[ins_nr + 1:en_nr + 1] = segment + route[ins_nr + 1:st_nr]
+                    first_nr, last_nr = ins_nr + 1, en_nr
+                else:
+                    route[st_nr:ins_nr + 1] = route[en_nr + 1:ins_nr + 1] + segment
+                    first_nr, last_nr = st_nr, ins_nr
+                for nr in range(first_nr, last_nr + 1):
+                    pos[route[nr]] = nr
+                for nr in changed[0], changed[4], last:
+                    self.set_rev_dist(route, pos[nr], pos[nr])
+                self.changed(first_nr, last_nr)
+                return changed
+        return None
+
+
+def TSP_Route_Job(args):
+    """
+    TSP_Route_Job() - Worker job of Main.optimize_TSP, optimizes the route
+    of one layer
+    @param args: start and end points of the shapes (the last one is the
+    start point of the machine), iterations, max_time and max_stall of run()
+    @return: the optimized route and the best lengths of the iterations
+    """
+    st_end_points, iterations, max_time, max_stall = args
+
+    #Islands need the genetic algorithm and worker processes of their own,
+    #which the workers of a pool can't start
+    route_opt = g.config.vars.Route_Optimisation
+    islands = get_worker_count(route_opt['islands'])
+    if islands > 1 and (route_opt['local_search'] == 'only' or
+                        len(st_end_points) > route_opt['sparse_shape_nrs']):
+        islands = 1
+    if islands > 1 and (not(hasattr(os, 'fork')) or multiprocessing.current_process().daemon):
+        logger.debug("No TSP islands in this process, using one population")
+        islands = 1
+
+    if islands > 1:
+        return TSP_Islands(st_end_points, iterations, max_time, max_stall, islands)
+
+    TSP = TSPoptimize(st_end_points=st_end_points)
+    for it_nr, length in TSP.run(iterations, max_time, max_stall):
+        logger.debug(("TSP iteration %i: length %0.1f") % (it_nr, length))
+    logger.debug(("TSP done with result: %s") % TSP)
+
+    return TSP.opt_route, TSP.Fittness.best_fittness
+
+
+def TSP_Islands(st_end_points, iterations, max_time, max_stall, islands,
+                migration=5):
+    """
+    TSP_Islands() - Island model: each worker process evolves a population
+    of its own, every migration iterations the best routes are exchanged
+    through shared memory (see TSPoptimize.migrate). The distance matrix is
+    generated once, the forked workers share it.
+    @return: the best route of all islands and the best lengths of its
+    island's iterations
+    """
+    start_time = time()
+    logger.info("TSP with %i islands for %i shapes" % (islands, len(st_end_points)))
+
+    DistanceMatrix = DistanceMatrixClass(matrix=[])
+    DistanceMatrix.generate_matrix(st_end_points)
+
+    routes = multiprocessing.Array('i', islands * len(st_end_points), lock=False)
+    lengths = multiprocessing.Array('d', [float('inf')] * islands, lock=False)
+    shared = (routes, lengths, multiprocessing.Lock(), multiprocessing.Queue())
+
+    workers = []
+    for island_nr in range(islands):
+        args = (iterations, max_time, max_stall, migration, start_time, random())
+        workers.append(multiprocessing.Process(target=TSP_Island_Worker,
+                                               args=(island_nr, st_end_points,
+                                                     DistanceMatrix, args, shared)))
+        workers[-1].start()
+
+    #The results are taken before the workers are joined, else a full
+    #queue would block them
+    results = []
+    while len(results) < islands:
+        try:
+            results.append(shared[3].get(timeout=1.0))
+        except Empty:
+            for worker in workers:
+                if worker.exitcode not in (None, 0):
+                    raise RuntimeError("TSP island worker failed with exit code %s"
+                                       % worker.exitcode)
+    for worker in workers:
+        worker.join()
+
+    best_result = results[0]
+    for result in results:
+        if (result[2][-1], result[0]) < (best_result[2][-1], best_result[0]):
+            best_result = result
+    logger.debug("TSP island %i has the best route, length %0.1f"
+                 % (best_result[0], best_result[2][-1]))
+    return best_result[1], best_result[2]
+
+
+def TSP_Island_Worker(island_nr, st_end_points, DistanceMatrix, args, shared):
+    """
+    TSP_Island_Worker() - Evolves the population of one island of
+    TSP_Islands in a worker process and puts (island_nr, best route, best
+    lengths) into the result queue
+    """
+    iterations, max_time, max_stall, migration, start_time, island_seed = args
+    routes, lengths, lock, results = shared
+
+    #Forked workers start with the same random numbers
+    seed(island_seed)
+
+    TSP = TSPoptimize(st_end_points=st_end_points, DistanceMatrix=DistanceMatrix)
+    TSP.start_time = start_time
+    for it_nr, length in TSP.run(iterations, max_time, max_stall):
+        logger.debug(("TSP island %i iteration %i: length %0.1f") % (island_nr, it_nr, length))
+        if (it_nr + 1) % migration == 0:
+            TSP.migrate(island_nr, routes, lengths, lock)
+
+    results.put((island_nr, TSP.opt_route, TSP.Fittness.best_fittness))
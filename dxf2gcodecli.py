@@ -50,15 +50,16 @@ import Core.Globals as g
 import Core.constants as c
 from Core.Shape import ShapeClass
 
-from PostPro.PostProcessor import MyPostProcessor
+from PostPro.PostProcessor import MyPostProcessor, Export_Job
+from PostPro.MotionList import MotionListClass, write_program
 from PostPro.Breaks import Breaks
 
 from DxfImport.Import import ReadDXF
 
 
-from PostPro.TspOptimisation import TSPoptimize
-
-sys.setrecursionlimit(2500)
+from PostPro.TspOptimisation import TSP_Route_Job
+from PostPro.RouteCache import RouteCacheClass
+from Core.ProcessPool import get_worker_count, map_jobs
 
 # Get folder of the main instance and write into globals
 g.folder = os.path.dirname(os.path.abspath(sys.argv[0])).replace("\\", "/")
@@ -81,6 +82,7 @@ class Main():
         self.LayerContents = []
         self.EntitiesRoot = []
         self.filename = ""
+        self.jobs = 1
 
 
     def optimize_TSP(self):
@@ -94,13 +96,27 @@ class Main():
         #Get the export order from the QTreeView
         logger.debug(('Updating order according to TreeView'))
 
+        route_opt = g.config.vars.Route_Optimisation
+
+        #Adding the Start and End Points to the List.
+        x_st = g.config.vars.Plane_Coordinates['axis1_start_end']
+        y_st = g.config.vars.Plane_Coordinates['axis2_start_end']
+        start = Point(x = x_st, y = y_st)
+        ende = Point(x = x_st, y = y_st)
+
+        #Routes of earlier exports with the same shapes are reused
+        route_cache = None
+        if route_opt['route_cache_size'] > 0:
+            route_cache = RouteCacheClass(os.path.join(g.folder, c.DEFAULT_ROUTE_CACHE_DIR),
+                                          route_opt['route_cache_size'] * 1024)
+
+        #One route job for each layer, the indices of the route are the
+        #indices of the layer's shapes
+        route_layers = []
+        route_jobs = []
+        route_keys = []
         for LayerContent in self.LayerContents:
 
-            #Initial values for the Lists to export.
-            self.shapes_to_write = []
-            self.shapes_fixed_order = []
-            shapes_st_en_points = []
-
             #Check all shapes of Layer which shall be exported and create List
             #for it.
             logger.debug(("Nr. of Shapes %s; Nr. of Shapes in Route %s")
@@ -108,52 +124,53 @@ class Main():
                                  len(LayerContent.exp_order)))
             logger.debug(("Export Order for start: %s") % LayerContent.exp_order)
 
-            for shape in self.shapes:
-                self.shapes_to_write.append(shape.nr)
-                shapes_st_en_points.append(shape.get_st_en_points())
+            shapes_st_en_points = [shape.get_st_en_points()
+                                   for shape in LayerContent.shapes]
 
             #Perform Export only if the Number of shapes to export is bigger than 0
-            if len(self.shapes_to_write)>0:
+            if len(shapes_st_en_points)>0:
                         #Errechnen der Iterationen
                         #Calculate the iterations
-                iter_ = min(g.config.vars.Route_Optimisation['max_iterations'],
-                         len(self.shapes_to_write)*50)
-
-                #Adding the Start and End Points to the List.
-                x_st = g.config.vars.Plane_Coordinates['axis1_start_end']
-                y_st = g.config.vars.Plane_Coordinates['axis2_start_end']
-                start = Point(x = x_st, y = y_st)
-                ende = Point(x = x_st, y = y_st)
+                iter_ = min(route_opt['max_iterations'],
+                         len(shapes_st_en_points)*50)
+
                 shapes_st_en_points.append([start, ende])
 
-                TSPs = []
-                TSPs.append(TSPoptimize(st_end_points = shapes_st_en_points))
-                logger.info(("TSP start values initialised for Layer %s")
+                if route_cache is not None:
+                    key = route_cache.make_key(shapes_st_en_points, route_opt)
+                    opt_route = route_cache.get_route(key, len(shapes_st_en_points))
+                    if opt_route is not None:
+                        logger.info(("Cached route used for Layer %s")
                                     % LayerContent.LayerName)
-                logger.debug(("Shapes to write: %s")
-                                     % self.shapes_to_write)
-                logger.debug(("Fixed order: %s")
-                                     % self.shapes_fixed_order)
-
-                for it_nr in range(iter_):
-                    #Only show each 50th step.
-                    if (it_nr % 50) == 0:
-                        TSPs[-1].calc_next_iteration()
-                        new_exp_order = []
-                        for nr in TSPs[-1].opt_route[1:len(TSPs[-1].opt_route)]:
-                            new_exp_order.append(nr)
-
-                logger.debug(("TSP done with result: %s") % TSPs[-1])
-
-                LayerContent.exp_order = new_exp_order
-
-                logger.debug(("New Export Order after TSP: %s")
-                                     % new_exp_order)
+                        LayerContent.exp_order = opt_route[1:len(opt_route)]
+                        continue
+                    route_keys.append(key)
+
+                #Only each 50th step is calculated
+                route_layers.append(LayerContent)
+                route_jobs.append((shapes_st_en_points, (iter_ + 49) // 50,
+                                   route_opt['max_time'],
+                                   route_opt['max_stall_iterations']))
             else:
                 LayerContent.exp_order = []
 
+        #The layers are independent, so they are optimized in parallel
+        logger.info(("Optimizing the routes of %i layers with %i jobs")
+                    % (len(route_jobs), get_worker_count(self.jobs)))
+        results = map_jobs(TSP_Route_Job, route_jobs, self.jobs)
+
+        if route_cache is not None:
+            for key, (opt_route, best_fittness) in zip(route_keys, results):
+                route_cache.set_route(key, opt_route)
+
+        for LayerContent, (opt_route, best_fittness) in zip(route_layers, results):
+            logger.info(("TSP done for Layer %s, length %0.1f -> %0.1f")
+                        % (LayerContent.LayerName, best_fittness[0], best_fittness[-1]))
 
+            LayerContent.exp_order = opt_route[1:len(opt_route)]
 
+            logger.debug(("New Export Order after TSP: %s")
+                                 % LayerContent.exp_order)
 
 
     def exportShapes(self, status=False, saveas=None):
@@ -211,6 +228,42 @@ class Main():
         if g.config.vars.General['write_to_stdout']:
             self.close()
 
+    def exportAllFormats(self, saveas):
+        """
+        Exports the shapes with each Postprocessor Config File. The motions
+        of the shapes are made only once, the Postprocessors write their
+        files from them in parallel.
+        @param saveas: The name of the files, the extension is replaced by the
+        output format of each Postprocessor.
+        """
+        if g.config.vars.General['write_to_stdout']:
+            logger.warning(("All formats can't be written to STDOUT, only the first is written"))
+            self.exportShapes(None, saveas)
+            return
+
+        motion_list = MotionListClass()
+        write_program(motion_list, self.load_filename, self.LayerContents)
+        logger.debug(("Nr. of recorded motions %i") % len(motion_list.motions))
+
+        #The name of the Postprocessor is added if an output format is used
+        #by more than one of them
+        fileBaseName = os.path.splitext(saveas)[0]
+        output_format = self.MyPostProcessor.output_format
+        export_jobs = []
+        for pp_file_nr in range(len(output_format)):
+            if output_format.count(output_format[pp_file_nr]) > 1:
+                pp_name = os.path.splitext(self.MyPostProcessor.postprocessor_files[pp_file_nr])[0]
+                save_filename = "%s_%s%s" % (fileBaseName, pp_name,
+                                             output_format[pp_file_nr])
+            else:
+                save_filename = fileBaseName + output_format[pp_file_nr]
+            export_jobs.append((pp_file_nr, save_filename, motion_list))
+
+        logger.info(("Writing %i formats with %i jobs")
+                    % (len(export_jobs), get_worker_count(self.jobs)))
+        for save_filename in map_jobs(Export_Job, export_jobs, self.jobs):
+            logger.info(("Exported %s") % save_filename)
+
 
 
 
@@ -241,7 +294,7 @@ class Main():
         logger.info(('Loading file: %s') % filename)
         #logger.info("<a href=file:%s>%s</a>" % (filename, filename))
 
-        values = ReadDXF(filename)
+        values = ReadDXF(filename, jobs=self.jobs)
 
         #Output the information in the text window
         logger.info(('Loaded layers: %s') % len(values.layers))
@@ -459,6 +512,11 @@ if __name__ == "__main__":
                       help = "export data to FILENAME")
     parser.add_argument("-q", "--quiet", action = "store_true",
                       dest = "quiet", help = "no GUI")
+    parser.add_argument("-j", "--jobs", dest = "jobs", type = int, default = 1,
+                      help = "number of worker processes (default 1, 0 = all cores)")
+    parser.add_argument("-a", "--all-formats", action = "store_true",
+                      dest = "all_formats",
+                      help = "export with each postprocessor config file")
 
 #    parser.add_option("-v", "--verbose",
 #                      action = "store_true", dest = "verbose")
@@ -468,6 +526,8 @@ if __name__ == "__main__":
     logger.debug("Started with following options \n%s" % (parser))
 
 
+    window.jobs = options.jobs
+
     if not(options.filename is None):
         window.filename = options.filename.decode("cp1252")
         #Initialize the scale, rotate and move coordinates
@@ -480,5 +540,8 @@ if __name__ == "__main__":
 
     if not(options.export_filename is None):
         window.optimize_TSP()
-        window.exportShapes(None, options.export_filename)
+        if options.all_formats:
+            window.exportAllFormats(options.export_filename)
+        else:
+            window.exportShapes(None, options.export_filename)
 